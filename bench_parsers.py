@@ -0,0 +1,129 @@
+"""
+Замер времени разбора страниц KbChaChaCha и KCar разными парсерами.
+
+Сохранённые страницы берутся из папки fixtures/ (kbchachacha_*.html и
+kcar_*.html). Сохранить страницу поиска можно так:
+
+    python bench_parsers.py --save kbchachacha "<URL страницы списка>"
+    python bench_parsers.py --save kcar "<URL страницы поиска>"
+
+В папке уже лежат синтетические страницы *_sample.html со структурой
+списков обеих площадок. Запуск замера:
+
+    python bench_parsers.py [--repeat 20] [--limit 5]
+
+Проверка, что с SoupStrainer и без него каждым парсером находятся одни
+и те же авто (код выхода 1 при расхождении):
+
+    python bench_parsers.py --check
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+from parsers import HTML_PARSER, parse_kbchachacha_cars, parse_kcar_cars
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+PAGE_PARSERS = {
+    "kbchachacha": parse_kbchachacha_cars,
+    "kcar": parse_kcar_cars,
+}
+
+
+def available_backends():
+    backends = ["html.parser"]
+    if HTML_PARSER == "lxml":
+        backends.append("lxml")
+    return backends
+
+
+def save_fixture(platform, url):
+    """Загрузка страницы с площадки в папку fixtures/"""
+    import requests
+
+    headers = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+    }
+    response = requests.get(url, headers=headers, timeout=(5, 30))
+    response.raise_for_status()
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    path = os.path.join(FIXTURES_DIR, f"{platform}_{int(time.time())}.html")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(response.text)
+    print(f"💾 Сохранено: {path} ({len(response.text) // 1024} КБ)")
+
+
+def cpu_time_per_page(parse, html, repeat, limit, parser, strain):
+    started = time.process_time()
+    for _ in range(repeat):
+        cars = parse(html, limit=limit, parser=parser, strain=strain)
+    return (time.process_time() - started) / repeat * 1000, len(cars)
+
+
+def load_fixtures():
+    pages = []
+    for platform in PAGE_PARSERS:
+        for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, f"{platform}_*.html"))):
+            with open(path, "r", encoding="utf-8") as f:
+                pages.append((platform, os.path.basename(path), f.read()))
+    if not pages:
+        print(f"⚠️ В {FIXTURES_DIR} нет сохранённых страниц, см. --save")
+    return pages
+
+
+def check_fixtures():
+    """Число страниц, где разбор со strainer не совпал с полным разбором"""
+    failures = 0
+    for platform, name, html in load_fixtures():
+        parse = PAGE_PARSERS[platform]
+        for parser in available_backends():
+            full = parse(html, parser=parser, strain=False)
+            strained = parse(html, parser=parser, strain=True)
+            if not full or strained != full:
+                failures += 1
+                print(
+                    f"❌ {name} ({parser}): без strainer {len(full)} авто, со strainer {len(strained)}"
+                )
+            else:
+                print(f"✅ {name} ({parser}): {len(full)} авто")
+    return failures
+
+
+def run_benchmark(repeat, limit):
+    pages = load_fixtures()
+    if not pages:
+        return
+
+    print(f"{'страница':<32} {'парсер':<12} {'strainer':<9} {'мс/стр':>8} {'авто':>5}")
+    for platform, name, html in pages:
+        for parser in available_backends():
+            for strain in (False, True):
+                ms, found = cpu_time_per_page(
+                    PAGE_PARSERS[platform], html, repeat, limit, parser, strain
+                )
+                print(
+                    f"{name:<32} {parser:<12} {'да' if strain else 'нет':<9} {ms:>8.2f} {found:>5}"
+                )
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--save", nargs=2, metavar=("PLATFORM", "URL"))
+    arg_parser.add_argument("--repeat", type=int, default=20)
+    arg_parser.add_argument("--limit", type=int, default=5)
+    arg_parser.add_argument("--check", action="store_true")
+    args = arg_parser.parse_args()
+
+    if args.save:
+        platform, url = args.save
+        if platform not in PAGE_PARSERS:
+            arg_parser.error(f"площадка должна быть одной из: {', '.join(PAGE_PARSERS)}")
+        save_fixture(platform, url)
+    elif args.check:
+        sys.exit(1 if check_fixtures() else 0)
+    else:
+        run_benchmark(args.repeat, args.limit or None)
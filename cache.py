@@ -0,0 +1,96 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from persistence import DebouncedWriter
+
+
+class TTLCache:
+    """
+    Потокобезопасный LRU-кэш с ограничением времени жизни записей.
+
+    При указании path содержимое сохраняется в JSON-файл (не чаще раза
+    в save_delay секунд, атомарно) и подгружается после перезапуска
+    (значения должны сериализоваться в JSON).
+    """
+
+    def __init__(self, maxsize=512, ttl=3600, path=None, save_delay=2.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self._data = OrderedDict()  # key -> (время записи, значение)
+        self._lock = threading.Lock()
+        self._writer = (
+            DebouncedWriter(path, self._snapshot, delay=save_delay, ensure_ascii=False)
+            if path
+            else None
+        )
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            stored_at, value = item
+            if time.time() - stored_at > self.ttl:
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def get_entry(self, key):
+        """Значение вместе с его возрастом в секундах: (value, age) или None"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            stored_at, value = item
+            age = time.time() - stored_at
+            if age > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value, age
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.time(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        if self._writer is not None:
+            self._writer.mark_dirty()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def load(self):
+        """Загрузка сохранённых записей с диска (просроченные пропускаются)"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+        except Exception as e:
+            print(f"⚠️ Не удалось загрузить кэш {self.path}: {e}")
+            return
+
+        now = time.time()
+        with self._lock:
+            for key, stored_at, value in raw:
+                if now - stored_at <= self.ttl:
+                    self._data[key] = (stored_at, value)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def save(self):
+        """Немедленная запись отложенных изменений на диск"""
+        if self._writer is not None:
+            self._writer.flush()
+
+    def _snapshot(self):
+        with self._lock:
+            return [[key, stored_at, value] for key, (stored_at, value) in self._data.items()]
@@ -0,0 +1,114 @@
+import os
+
+from dotenv import load_dotenv
+
+# Загружаем переменные из .env до чтения настроек
+load_dotenv()
+
+# Интервал опроса площадок для каждой подписки (в секундах)
+MONITOR_INTERVAL = int(os.getenv("MONITOR_INTERVAL", "300"))
+
+# Максимальное число одновременных проверок подписок в цикле мониторинга
+MONITOR_WORKERS = int(os.getenv("MONITOR_WORKERS", "32"))
+
+# Адаптивный интервал опроса: границы (в секундах) и сколько новых объявлений
+# в среднем должна находить одна проверка
+MONITOR_MIN_INTERVAL = int(os.getenv("MONITOR_MIN_INTERVAL", "60"))
+MONITOR_MAX_INTERVAL = int(os.getenv("MONITOR_MAX_INTERVAL", str(30 * 60)))
+MONITOR_TARGET_NEW_PER_POLL = float(os.getenv("MONITOR_TARGET_NEW_PER_POLL", "1"))
+
+# Листание выдачи при проверке подписки: максимум страниц за проверку,
+# размер страницы Encar и сколько свежих авто Encar прислать сразу
+# после создания запроса
+MONITOR_MAX_PAGES = int(os.getenv("MONITOR_MAX_PAGES", "5"))
+ENCAR_PAGE_SIZE = int(os.getenv("ENCAR_PAGE_SIZE", "20"))
+ENCAR_INITIAL_RESULTS = int(os.getenv("ENCAR_INITIAL_RESULTS", "1"))
+
+# Сколько последних объявлений помнить для каждой подписки
+SEEN_MAX_PER_REQUEST = int(os.getenv("SEEN_MAX_PER_REQUEST", "1000"))
+
+# Горизонт хранения отправленных объявлений (в днях)
+SEEN_TTL_DAYS = int(os.getenv("SEEN_TTL_DAYS", "30"))
+
+# Через сколько секунд после изменения сохранять access.json и файлы кэшей
+# (серия изменений за это время записывается одним разом)
+STATE_SAVE_DELAY = float(os.getenv("STATE_SAVE_DELAY", "2"))
+
+# Таймауты HTTP-запросов к площадкам (в секундах)
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "20"))
+
+# Размер пула keep-alive соединений на один хост
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+
+# Максимум одновременных запросов к одному хосту
+HTTP_HOST_CONCURRENCY = int(os.getenv("HTTP_HOST_CONCURRENCY", "4"))
+
+# Автомат цепи для хостов площадок: ошибок подряд до размыкания и
+# границы паузы (в секундах), которая удваивается с каждым размыканием
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_BASE_BACKOFF = int(os.getenv("CIRCUIT_BASE_BACKOFF", "30"))
+CIRCUIT_MAX_BACKOFF = int(os.getenv("CIRCUIT_MAX_BACKOFF", "900"))
+
+# Кэш навигации по каталогу Encar: размер, время жизни (в секундах)
+# и сохранение на диск между перезапусками
+NAV_CACHE_SIZE = int(os.getenv("NAV_CACHE_SIZE", "512"))
+NAV_CACHE_TTL = int(os.getenv("NAV_CACHE_TTL", str(12 * 3600)))
+NAV_CACHE_PERSIST = os.getenv("NAV_CACHE_PERSIST", "1") == "1"
+
+# Снимок каталогов площадок: через сколько секунд запись обновляется в фоне,
+# максимальный возраст записи и число записей
+CATALOG_REFRESH_AGE = int(os.getenv("CATALOG_REFRESH_AGE", str(6 * 3600)))
+CATALOG_SNAPSHOT_MAX_AGE = int(os.getenv("CATALOG_SNAPSHOT_MAX_AGE", str(7 * 24 * 3600)))
+CATALOG_SNAPSHOT_SIZE = int(os.getenv("CATALOG_SNAPSHOT_SIZE", "256"))
+
+# Периодичность прогрева снимка и число популярных марок, для которых
+# заранее загружаются модели
+CATALOG_PREWARM_INTERVAL = int(os.getenv("CATALOG_PREWARM_INTERVAL", str(6 * 3600)))
+CATALOG_PREWARM_MAKERS = int(os.getenv("CATALOG_PREWARM_MAKERS", "10"))
+
+# Подробности авто Encar: параллельные запросы, размер и время жизни кэша
+ENCAR_DETAILS_CONCURRENCY = int(os.getenv("ENCAR_DETAILS_CONCURRENCY", "8"))
+ENCAR_DETAILS_CACHE_SIZE = int(os.getenv("ENCAR_DETAILS_CACHE_SIZE", "2000"))
+ENCAR_DETAILS_CACHE_TTL = int(os.getenv("ENCAR_DETAILS_CACHE_TTL", str(24 * 3600)))
+
+# JSON-список объявлений KCar: адрес, размер страницы и максимум страниц
+KCAR_LIST_API_URL = os.getenv(
+    "KCAR_LIST_API_URL", "https://api.kcar.com/bc/search/list/drct"
+)
+KCAR_API_PAGE_SIZE = int(os.getenv("KCAR_API_PAGE_SIZE", "20"))
+KCAR_API_MAX_PAGES = int(os.getenv("KCAR_API_MAX_PAGES", "3"))
+# Сортировка выдачи KCar (поле и значение в searchCond): новые объявления
+# должны идти первыми, иначе мониторинг остановится раньше времени
+KCAR_ORDER_FIELD = os.getenv("KCAR_ORDER_FIELD", "orderBy")
+KCAR_ORDER = os.getenv("KCAR_ORDER", "sell_reg_dt desc")
+
+# Отправка сообщений в Telegram: сообщений в секунду на бота и на чат,
+# запас на короткие всплески в чате, число потоков отправки и попыток
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30"))
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", "1"))
+TELEGRAM_CHAT_BURST = int(os.getenv("TELEGRAM_CHAT_BURST", "3"))
+SEND_WORKERS = int(os.getenv("SEND_WORKERS", "8"))
+SEND_MAX_ATTEMPTS = int(os.getenv("SEND_MAX_ATTEMPTS", "5"))
+# Сколько секунд при остановке ждать отправки очереди (Heroku даёт 30 с
+# после SIGTERM); неотправленное дописывается в dead_letters.jsonl
+SEND_DRAIN_TIMEOUT = float(os.getenv("SEND_DRAIN_TIMEOUT", "20"))
+
+# Пул обработчиков сообщений и кнопок бота: число потоков, предел очереди
+# и как часто (в секундах) выводить её глубину
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", "8"))
+BOT_MAX_PENDING = int(os.getenv("BOT_MAX_PENDING", "1000"))
+BOT_QUEUE_REPORT_INTERVAL = int(os.getenv("BOT_QUEUE_REPORT_INTERVAL", "300"))
+
+# Режим вебхука: если задан WEBHOOK_URL (публичный адрес сервиса), бот
+# принимает обновления через встроенный FastAPI/uvicorn вместо long polling.
+# На Heroku HTTP приходит только в процесс web, а в Procfile объявлен
+# worker: для этого режима замените в Procfile строку на
+# "web: python3 main.py" (оба процесса сразу запускать нельзя — worker без
+# WEBHOOK_URL начнёт опрос параллельно). Если WEBHOOK_SECRET не задан, он
+# генерируется при каждом запуске
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("PORT", os.getenv("WEBHOOK_PORT", "8080")))
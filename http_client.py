@@ -0,0 +1,217 @@
+import asyncio
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class CircuitOpenError(Exception):
+    """Запрос не отправлен: площадка недоступна, автомат цепи разомкнут"""
+
+    def __init__(self, host, retry_after):
+        super().__init__(f"{host} недоступен, повтор через {retry_after:.0f} с")
+        self.host = host
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Автомат цепи для каждого хоста площадки.
+
+    После failure_threshold ошибок подряд (сетевые ошибки, 429 и 5xx) хост
+    считается недоступным, и запросы к нему не отправляются в течение
+    паузы, которая растёт экспоненциально (со случайным разбросом) с каждым
+    неудачным размыканием. По истечении паузы пропускается один пробный
+    запрос: при успехе цепь замыкается, при ошибке пауза удваивается.
+    Один экземпляр общий для синхронного и асинхронного клиентов.
+    """
+
+    def __init__(self, failure_threshold=5, base_backoff=30, max_backoff=900):
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._hosts = {}  # host -> состояние автомата
+        self._lock = threading.Lock()
+
+    def before_request(self, url):
+        """Проверка перед запросом; CircuitOpenError, если хост недоступен"""
+        host = urlsplit(url).hostname or ""
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None or state["open_until"] is None:
+                return
+            now = time.monotonic()
+            if now < state["open_until"] or state["probing"]:
+                raise CircuitOpenError(host, max(state["open_until"] - now, 1))
+            # Полуоткрытое состояние: пропускаем один пробный запрос
+            state["probing"] = True
+
+    def record_success(self, url):
+        host = urlsplit(url).hostname or ""
+        with self._lock:
+            state = self._hosts.pop(host, None)
+        if state is not None and state["open_until"] is not None:
+            print(f"✅ {host} снова доступен")
+
+    def record_failure(self, url):
+        host = urlsplit(url).hostname or ""
+        with self._lock:
+            state = self._hosts.setdefault(
+                host, {"failures": 0, "opens": 0, "open_until": None, "probing": False}
+            )
+            state["failures"] += 1
+            if not state["probing"]:
+                if state["failures"] < self.failure_threshold:
+                    return
+                # Запросы, отправленные до размыкания, паузу не продлевают
+                open_until = state["open_until"]
+                if open_until is not None and open_until > time.monotonic():
+                    return
+            state["opens"] += 1
+            backoff = min(self.max_backoff, self.base_backoff * 2 ** (state["opens"] - 1))
+            backoff *= random.uniform(0.5, 1.0)
+            state["open_until"] = time.monotonic() + backoff
+            state["probing"] = False
+        print(f"⛔ {host} недоступен, пауза {backoff:.0f} с")
+
+    def record_response(self, url, status_code):
+        if status_code == 429 or status_code >= 500:
+            self.record_failure(url)
+        else:
+            self.record_success(url)
+
+
+class HttpClient:
+    """
+    Общий HTTP-клиент для всех запросов к площадкам.
+
+    Использует одну сессию requests с пулом keep-alive соединений для
+    каждого хоста, таймаутами на подключение и чтение по умолчанию и
+    ограничением числа одновременных запросов к одному хосту.
+    """
+
+    def __init__(
+        self,
+        connect_timeout=5,
+        read_timeout=20,
+        pool_size=10,
+        host_concurrency=4,
+        host_limits=None,
+        breaker=None,
+    ):
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = breaker
+        self.host_concurrency = host_concurrency
+        self.host_limits = host_limits or {}
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=20, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        """Запрос с таймаутом по умолчанию и лимитом одновременных запросов к хосту"""
+        kwargs.setdefault("timeout", self.timeout)
+        if self.breaker is None:
+            with self._host_semaphore(url):
+                return self.session.request(method, url, **kwargs)
+
+        self.breaker.before_request(url)
+        try:
+            with self._host_semaphore(url):
+                response = self.session.request(method, url, **kwargs)
+        except requests.RequestException:
+            self.breaker.record_failure(url)
+            raise
+        self.breaker.record_response(url, response.status_code)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def _host_semaphore(self, url):
+        host = urlsplit(url).hostname or ""
+        with self._lock:
+            semaphore = self._semaphores.get(host)
+            if semaphore is None:
+                limit = self.host_limits.get(host, self.host_concurrency)
+                semaphore = threading.BoundedSemaphore(limit)
+                self._semaphores[host] = semaphore
+            return semaphore
+
+
+class AsyncHttpClient:
+    """
+    Асинхронный HTTP-клиент (httpx) для движка мониторинга.
+
+    Используется только внутри цикла событий планировщика: общий пул
+    соединений, таймауты и семафоры на каждый хост площадки.
+    """
+
+    def __init__(
+        self,
+        connect_timeout=5,
+        read_timeout=20,
+        pool_size=10,
+        host_concurrency=4,
+        host_limits=None,
+        breaker=None,
+    ):
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.breaker = breaker
+        self.limits = httpx.Limits(
+            max_connections=pool_size * 5, max_keepalive_connections=pool_size
+        )
+        self.host_concurrency = host_concurrency
+        self.host_limits = host_limits or {}
+        self._client = None
+        self._semaphores = {}
+
+    async def request(self, method, url, **kwargs):
+        """Запрос с лимитом одновременных запросов к хосту"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout, limits=self.limits, follow_redirects=True
+            )
+        if self.breaker is None:
+            async with self._host_semaphore(url):
+                return await self._client.request(method, url, **kwargs)
+
+        self.breaker.before_request(url)
+        try:
+            async with self._host_semaphore(url):
+                response = await self._client.request(method, url, **kwargs)
+        except (httpx.HTTPError, asyncio.CancelledError):
+            # Прерванный пробный запрос тоже освобождает полуоткрытое состояние
+            self.breaker.record_failure(url)
+            raise
+        self.breaker.record_response(url, response.status_code)
+        return response
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _host_semaphore(self, url):
+        host = urlsplit(url).hostname or ""
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            limit = self.host_limits.get(host, self.host_concurrency)
+            semaphore = asyncio.Semaphore(limit)
+            self._semaphores[host] = semaphore
+        return semaphore
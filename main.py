@@ -1,8 +1,15 @@
+import hashlib
 import json
+import re
+import secrets
 import time
-import telebot
+import asyncio
+import atexit
+import functools
+import threading
 import os
-import requests
+import signal
+import sys
 import urllib.parse
 from telebot import types
 from telebot.handler_backends import State, StatesGroup
@@ -10,14 +17,32 @@ from telebot.storage import StateMemoryStorage
 from dotenv import load_dotenv
 from datetime import datetime
 from translations import translations
-from bs4 import BeautifulSoup
+from scheduler import AdaptiveInterval, MonitorScheduler
+from seen_store import SeenStore
+from subscription_store import SubscriptionStore
+from http_client import AsyncHttpClient, CircuitBreaker, CircuitOpenError, HttpClient
+from cache import TTLCache
+from persistence import DebouncedWriter, flush_all
+from send_queue import SendQueue
+from worker_pool import KeyedWorkerPool, PooledTeleBot
+from metrics import LatencyHistogram
+from parsers import parse_kbchachacha_cars, parse_kcar_cars
+import config
 
 # Путь до файла
-REQUESTS_FILE = "requests.json"
+REQUESTS_FILE = "requests.db"
 ACCESS_FILE = "access.json"
+SEEN_FILE = "seen.db"
+NAV_CACHE_FILE = "nav_cache.json"
+CATALOG_SNAPSHOT_FILE = "catalog_snapshot.json"
+DEAD_LETTER_FILE = "dead_letters.jsonl"
 
-# Глобальный словарь всех запросов пользователей
-user_requests = {}
+# Ограничения Telegram: фото в одном альбоме и длина текста сообщения
+MEDIA_GROUP_SIZE = 10
+MESSAGE_MAX_LENGTH = 4096
+
+# Сохранённые запросы пользователей (при первом запуске переносятся из requests.json)
+subscription_store = SubscriptionStore(REQUESTS_FILE)
 
 # Словарь переводов цветов для KbChaChaCha
 KBCHACHA_COLOR_TRANSLATIONS = {
@@ -84,12 +109,19 @@ def load_access():
     return set()
 
 
+# Список доступа сохраняется атомарно и не чаще раза в STATE_SAVE_DELAY секунд
+access_writer = DebouncedWriter(
+    ACCESS_FILE,
+    # copy() берёт снимок множества целиком, пока обработчики его меняют
+    lambda: sorted(ACCESS.copy()),
+    delay=config.STATE_SAVE_DELAY,
+    ensure_ascii=False,
+    indent=2,
+)
+
+
 def save_access():
-    try:
-        with open(ACCESS_FILE, "w", encoding="utf-8") as f:
-            json.dump(list(ACCESS), f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        print(f"⚠️ Ошибка при сохранении access.json: {e}")
+    access_writer.mark_dirty()
 
 
 MANAGER = 56022406
@@ -114,59 +146,171 @@ COLOR_TRANSLATIONS = {
 load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 
+# Автомат цепи по хостам (прокси Encar, api.encar.com, kbchachacha.com,
+# kcar.com, api.kcar.com): при недоступности площадки запросы к ней
+# приостанавливаются, общий для обоих HTTP-клиентов
+host_breaker = CircuitBreaker(
+    failure_threshold=config.CIRCUIT_FAILURE_THRESHOLD,
+    base_backoff=config.CIRCUIT_BASE_BACKOFF,
+    max_backoff=config.CIRCUIT_MAX_BACKOFF,
+)
+
+# Общий HTTP-клиент с пулом соединений и таймаутами для всех площадок
+http_client = HttpClient(
+    connect_timeout=config.HTTP_CONNECT_TIMEOUT,
+    read_timeout=config.HTTP_READ_TIMEOUT,
+    pool_size=config.HTTP_POOL_SIZE,
+    host_concurrency=config.HTTP_HOST_CONCURRENCY,
+    breaker=host_breaker,
+)
+
+# Асинхронный HTTP-клиент движка мониторинга (работает в цикле планировщика)
+monitor_http = AsyncHttpClient(
+    connect_timeout=config.HTTP_CONNECT_TIMEOUT,
+    read_timeout=config.HTTP_READ_TIMEOUT,
+    pool_size=config.HTTP_POOL_SIZE,
+    host_concurrency=config.HTTP_HOST_CONCURRENCY,
+    breaker=host_breaker,
+)
+
+# Кэш навигации по каталогу Encar (марки, модели, поколения, комплектации)
+nav_cache = TTLCache(
+    maxsize=config.NAV_CACHE_SIZE,
+    ttl=config.NAV_CACHE_TTL,
+    path=NAV_CACHE_FILE if config.NAV_CACHE_PERSIST else None,
+    save_delay=config.STATE_SAVE_DELAY,
+)
+
+# Снимок верхних уровней каталогов всех площадок (марки и модели),
+# прогревается при запуске и обновляется в фоне
+catalog_snapshot = TTLCache(
+    maxsize=config.CATALOG_SNAPSHOT_SIZE,
+    ttl=config.CATALOG_SNAPSHOT_MAX_AGE,
+    path=CATALOG_SNAPSHOT_FILE,
+    save_delay=config.STATE_SAVE_DELAY,
+)
+catalog_refreshing = set()
+catalog_refresh_lock = threading.Lock()
+
 # FSM-хранилище
 state_storage = StateMemoryStorage()
 
-# Инициализация бота
-bot = telebot.TeleBot(BOT_TOKEN, state_storage=state_storage)
+# Инициализация бота: обработчики выполняются в ограниченном пуле потоков,
+# нажатия одного пользователя — строго по порядку
+update_pool = KeyedWorkerPool(
+    workers=config.BOT_WORKERS, max_pending=config.BOT_MAX_PENDING, name="handler"
+)
+bot = PooledTeleBot(BOT_TOKEN, update_pool, state_storage=state_storage)
 user_search_data = {}
 
+# Очередь исходящих сообщений с ограничением скорости Telegram (общим и
+# на чат), повторами и журналом неотправленных сообщений
+send_queue = SendQueue(
+    bot,
+    global_rate=config.TELEGRAM_GLOBAL_RATE,
+    chat_rate=config.TELEGRAM_CHAT_RATE,
+    chat_burst=config.TELEGRAM_CHAT_BURST,
+    workers=config.SEND_WORKERS,
+    max_attempts=config.SEND_MAX_ATTEMPTS,
+    dead_letter_path=DEAD_LETTER_FILE,
+)
 
-# Проверка на то может ли человек пользоваться ботом или нет
-def is_authorized(user_id):
-    return user_id in ACCESS
+# Общий планировщик мониторинга всех сохранённых подписок: один цикл
+# событий asyncio, в котором выполняются проверки всех запросов
+monitor_scheduler = MonitorScheduler(max_workers=config.MONITOR_WORKERS)
+
+# Интервал опроса каждого запроса подстраивается под частоту новых объявлений:
+# популярные запросы проверяются чаще, «мёртвые» — реже
+monitor_intervals = AdaptiveInterval(
+    config.MONITOR_INTERVAL,
+    config.MONITOR_MIN_INTERVAL,
+    config.MONITOR_MAX_INTERVAL,
+    target_per_poll=config.MONITOR_TARGET_NEW_PER_POLL,
+)
 
 
-def translate_phrase(phrase):
-    words = phrase.split()
-    translated_words = [translations.get(word, word) for word in words]
-    return " ".join(translated_words)
+# Время выполнения шагов мастера поиска (см. /stats)
+wizard_latency = LatencyHistogram()
 
 
-def load_requests():
-    global user_requests
-    if os.path.exists(REQUESTS_FILE):
-        try:
-            with open(REQUESTS_FILE, "r", encoding="utf-8") as f:
-                user_requests = json.load(f)
-        except Exception as e:
-            print(f"⚠️ Не удалось загрузить запросы: {e}")
-            user_requests = {}
-    else:
-        user_requests = {}
+def wizard_step(step):
+    """
+    Шаг мастера поиска с запросами к площадке: нажатие кнопки подтверждается
+    сразу (Telegram не показывает «часики» и не отбрасывает нажатие по
+    таймауту), затем выполняется сам обработчик, а его длительность
+    записывается в гистограмму под именем step.
+    """
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(call):
+            started = time.perf_counter()
+            try:
+                bot.answer_callback_query(call.id, "⏳ Загружаю…")
+                call.wizard_answered = True
+            except Exception as e:
+                print(f"⚠️ Не удалось подтвердить нажатие: {e}")
+            try:
+                return handler(call)
+            finally:
+                wizard_latency.observe(step, time.perf_counter() - started)
+
+        return wrapper
 
+    return decorator
 
-def save_requests(new_data):
-    global user_requests
+
+def show_loading(call):
+    """Заглушка в нажатом сообщении, пока шаг мастера загружает данные"""
     try:
-        if os.path.exists(REQUESTS_FILE):
-            with open(REQUESTS_FILE, "r", encoding="utf-8") as f:
-                content = f.read().strip()
-                existing_data = json.loads(content) if content else {}
-        else:
-            existing_data = {}
+        bot.edit_message_text(
+            "⏳ Загружаю…",
+            chat_id=call.message.chat.id,
+            message_id=call.message.message_id,
+        )
+    except Exception as e:
+        print(f"⚠️ Не удалось показать заглушку загрузки: {e}")
 
-        for user_id, new_requests in new_data.items():
-            # Убедимся, что user_id — строка
-            user_id_str = str(user_id)
-            existing_data[user_id_str] = new_requests
 
-        user_requests = existing_data  # Обновляем глобальные данные
+def show_step(call, text, reply_markup=None):
+    """Результат шага мастера — в то же сообщение, вместо заглушки"""
+    bot.edit_message_text(
+        text,
+        chat_id=call.message.chat.id,
+        message_id=call.message.message_id,
+        reply_markup=reply_markup,
+    )
+
 
-        with open(REQUESTS_FILE, "w", encoding="utf-8") as f:
-            json.dump(user_requests, f, ensure_ascii=False, indent=2)
+def restore_step(call, text):
+    """Сбой загрузки: возвращаем нажатому сообщению прежний вид и сообщаем об ошибке"""
+    try:
+        show_step(call, call.message.text, call.message.reply_markup)
     except Exception as e:
-        print(f"⚠️ Ошибка сохранения запросов: {e}")
+        print(f"⚠️ Не удалось восстановить сообщение: {e}")
+    notify_callback(call, text)
+
+
+def notify_callback(call, text):
+    """
+    Короткое сообщение в ответ на нажатие кнопки: всплывающее, если на
+    нажатие ещё не ответили, иначе — обычным сообщением в чат.
+    """
+    if getattr(call, "wizard_answered", False):
+        bot.send_message(call.message.chat.id, text)
+    else:
+        bot.answer_callback_query(call.id, text)
+
+
+# Проверка на то может ли человек пользоваться ботом или нет
+def is_authorized(user_id):
+    return user_id in ACCESS
+
+
+def translate_phrase(phrase):
+    words = phrase.split()
+    translated_words = [translations.get(word, word) for word in words]
+    return " ".join(translated_words)
 
 
 # FSM: Состояния формы
@@ -180,12 +324,95 @@ class CarForm(StatesGroup):
     mileage_to = State()
 
 
+# Признак того, что поток сейчас обновляет снимок каталога: запросы к
+# /api/nav Encar в это время идут мимо nav_cache (см. fetch_encar_nav)
+catalog_refresh_context = threading.local()
+
+
+def refresh_catalog_entry(key, loader, args):
+    """Загрузка раздела каталога с площадки и запись в снимок (пустые ответы не сохраняются)"""
+    catalog_refresh_context.active = True
+    try:
+        value = loader(*args)
+    finally:
+        catalog_refresh_context.active = False
+    if value:
+        catalog_snapshot.set(key, value)
+    return value
+
+
+def refresh_catalog_entry_async(key, loader, args):
+    """Фоновое обновление раздела каталога; повторные запросы одного ключа объединяются"""
+    with catalog_refresh_lock:
+        if key in catalog_refreshing:
+            return
+        catalog_refreshing.add(key)
+
+    def worker():
+        try:
+            refresh_catalog_entry(key, loader, args)
+        finally:
+            with catalog_refresh_lock:
+                catalog_refreshing.discard(key)
+
+    threading.Thread(target=worker, daemon=True).start()
+
+
+def catalog_cached(name):
+    """
+    Отдаёт раздел каталога из локального снимка, не дожидаясь площадки.
+    Устаревшие записи возвращаются сразу и обновляются в фоне;
+    wrapper.refresh(*args) принудительно перезагружает раздел.
+    """
+
+    def decorator(loader):
+        def make_key(args):
+            return ":".join([name, *map(str, args)])
+
+        @functools.wraps(loader)
+        def wrapper(*args):
+            key = make_key(args)
+            entry = catalog_snapshot.get_entry(key)
+            if entry is None:
+                return refresh_catalog_entry(key, loader, args)
+            value, age = entry
+            if age > config.CATALOG_REFRESH_AGE:
+                refresh_catalog_entry_async(key, loader, args)
+            return value
+
+        wrapper.refresh = lambda *args: refresh_catalog_entry(
+            make_key(args), loader, args
+        )
+        return wrapper
+
+    return decorator
+
+
+def fetch_encar_nav(url, fresh=False):
+    """
+    Запрос дерева каталога Encar (/api/nav) с кэшированием по пути запроса.
+    Каталог меняется редко, поэтому шаги мастера отвечают из памяти.
+    При fresh=True (и при обновлении снимка каталога) ответ берётся с
+    площадки, а кэш обновляется им.
+    """
+    fresh = fresh or getattr(catalog_refresh_context, "active", False)
+    if not fresh:
+        data = nav_cache.get(url)
+        if data is not None:
+            return data
+
+    response = http_client.get(url, headers={"User-Agent": "Mozilla/5.0"})
+    data = response.json()
+    if response.status_code == 200:
+        nav_cache.set(url, data)
+    return data
+
+
+@catalog_cached("encar_manufacturers")
 def get_manufacturers():
     url = "https://encar-proxy-main.onrender.com/api/nav?count=true&q=(And.Hidden.N._.SellType.%EC%9D%BC%EB%B0%98._.CarType.A.)&inav=%7CMetadata%7CSort"
-    headers = {"User-Agent": "Mozilla/5.0"}
     try:
-        response = requests.get(url, headers=headers)
-        data = response.json()
+        data = fetch_encar_nav(url)
         manufacturers = (
             data.get("iNav", {})
             .get("Nodes", [])[2]
@@ -201,12 +428,11 @@ def get_manufacturers():
         return []
 
 
+@catalog_cached("encar_models")
 def get_models_by_brand(manufacturer):
     url = f"https://encar-proxy-main.onrender.com/api/nav?count=true&q=(And.Hidden.N._.SellType.%EC%9D%BC%EB%B0%98._.(C.CarType.A._.Manufacturer.{manufacturer}.))&inav=%7CMetadata%7CSort"
-    headers = {"User-Agent": "Mozilla/5.0"}
     try:
-        response = requests.get(url, headers=headers)
-        data = response.json()
+        data = fetch_encar_nav(url)
         all_manufacturers = (
             data.get("iNav", {})
             .get("Nodes", [])[2]
@@ -232,10 +458,8 @@ def get_models_by_brand(manufacturer):
 
 def get_generations_by_model(manufacturer, model_group):
     url = f"https://encar-proxy-main.onrender.com/api/nav?count=true&q=(And.Hidden.N._.SellType.%EC%9D%BC%EB%B0%98._.(C.CarType.A._.(C.Manufacturer.{manufacturer}._.ModelGroup.{model_group}.)))&inav=%7CMetadata%7CSort"
-    headers = {"User-Agent": "Mozilla/5.0"}
     try:
-        response = requests.get(url, headers=headers)
-        data = response.json()
+        data = fetch_encar_nav(url)
         all_manufacturers = (
             data.get("iNav", {})
             .get("Nodes", [])[2]
@@ -269,10 +493,8 @@ def get_generations_by_model(manufacturer, model_group):
 
 def get_trims_by_generation(manufacturer, model_group, model):
     url = f"https://encar-proxy-main.onrender.com/api/nav?count=true&q=(And.Hidden.N._.(C.CarType.A._.(C.Manufacturer.{manufacturer}._.(C.ModelGroup.{model_group}._.Model.{model}.))))&inav=%7CMetadata%7CSort"
-    headers = {"User-Agent": "Mozilla/5.0"}
     try:
-        response = requests.get(url, headers=headers)
-        data = response.json()
+        data = fetch_encar_nav(url)
         all_manufacturers = (
             data.get("iNav", {})
             .get("Nodes", [])[1]
@@ -406,26 +628,19 @@ def handle_my_requests(call):
         bot.answer_callback_query(call.id, "❌ У вас нет доступа к боту.")
         return
 
-    user_id = str(call.from_user.id)
-    requests_list = user_requests.get(user_id, [])
-    load_requests()
+    requests_list = subscription_store.list(call.from_user.id)
 
     if not requests_list:
         bot.answer_callback_query(call.id, "У вас пока нет сохранённых запросов.")
         return
 
     for idx, req in enumerate(requests_list, 1):
-        text = (
-            f"📌 *Запрос #{idx}:*\n"
-            f"{req['manufacturer']} / {req['model_group']} / {req['model']} / {req['trim']}\n"
-            f"Год: {req['year']}, Пробег: {req['mileage_from']}–{req['mileage_to']} км\n"
-            f"Цвет: {req['color']}"
-        )
+        text = f"📌 *Запрос #{idx}:*\n" + describe_request(req)
 
         markup = types.InlineKeyboardMarkup()
         markup.add(
             types.InlineKeyboardButton(
-                f"🗑 Удалить запрос #{idx}", callback_data=f"delete_request_{idx - 1}"
+                f"🗑 Удалить запрос #{idx}", callback_data=f"delete_req_{req['id']}"
             )
         )
         bot.send_message(
@@ -433,16 +648,36 @@ def handle_my_requests(call):
         )
 
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith("delete_request_"))
+def describe_request(req):
+    """Краткое описание сохранённого запроса для списка запросов"""
+    platform = req.get("platform", "encar")
+    if platform == "kbchachacha":
+        title = f"KbChaChaCha: {req['maker_name']} / {req['class_name']} / {req['car_name']} / {req['model_name']}"
+    elif platform == "kcar":
+        title = f"KCar: {req['maker_name']} / {req['model_name']} / {req['gen_name']}"
+    else:
+        title = f"Encar: {req['manufacturer']} / {req['model_group']} / {req['model']} / {req['trim']}"
+    return (
+        f"{title}\n"
+        f"Год: {req['year_from']}–{req['year_to']}, Пробег: {req['mileage_from']}–{req['mileage_to']} км\n"
+        f"Цвет: {req['color']}"
+    )
+
+
+@bot.callback_query_handler(func=lambda call: call.data.startswith("delete_req_"))
 def handle_delete_request(call):
-    user_id = str(call.from_user.id)
-    index = int(call.data.split("_")[2])
-    if user_id not in user_requests or index >= len(user_requests[user_id]):
+    # Кнопка несёт постоянный id запроса, а не номер в списке: список мог
+    # измениться с момента, когда кнопка была показана
+    user_id = call.from_user.id
+    request_id = call.data.split("_", 2)[2]
+    removed = next(
+        (req for req in subscription_store.list(user_id) if req["id"] == request_id),
+        None,
+    )
+    if removed is None or not subscription_store.remove(request_id):
         bot.answer_callback_query(call.id, "⚠️ Запрос не найден.")
         return
 
-    removed = user_requests[user_id].pop(index)
-
     markup = types.InlineKeyboardMarkup()
     markup.add(
         types.InlineKeyboardButton("🏠 Вернуться в главное меню", callback_data="start")
@@ -455,17 +690,23 @@ def handle_delete_request(call):
     )
 
     print(f"🗑 Удалён запрос пользователя {user_id}: {removed}")
-    save_requests(user_requests)
-    load_requests()
+    unschedule_request(removed)
+
+
+@bot.callback_query_handler(func=lambda call: call.data.startswith("delete_request_"))
+def handle_legacy_delete_request(call):
+    # Кнопки с номером запроса в списке, отправленные до перехода на id
+    bot.answer_callback_query(
+        call.id, "⚠️ Кнопка устарела, откройте список запросов заново."
+    )
 
 
 @bot.callback_query_handler(func=lambda call: call.data == "delete_all_requests")
 def handle_delete_all_requests(call):
-    user_id = str(call.from_user.id)
-    if user_id in user_requests:
-        user_requests[user_id] = []
-        save_requests(user_requests)
-        load_requests()
+    removed = subscription_store.remove_user(call.from_user.id)
+    if removed:
+        for req in removed:
+            unschedule_request(req)
         bot.send_message(call.message.chat.id, "✅ Все ваши запросы успешно удалены.")
     else:
         bot.send_message(call.message.chat.id, "⚠️ У вас нет сохранённых запросов.")
@@ -487,6 +728,7 @@ def handle_search_car(call):
 
 
 @bot.callback_query_handler(func=lambda call: call.data.startswith("platform_"))
+@wizard_step("platform")
 def handle_platform_selection(call):
     platform = call.data.split("_")[1]
 
@@ -499,9 +741,10 @@ def handle_platform_selection(call):
 
 
 def handle_encar_search(call):
+    show_loading(call)
     manufacturers = get_manufacturers()
     if not manufacturers:
-        bot.answer_callback_query(call.id, "Не удалось загрузить марки.")
+        restore_step(call, "Не удалось загрузить марки.")
         return
 
     markup = types.InlineKeyboardMarkup(row_width=2)
@@ -514,17 +757,17 @@ def handle_encar_search(call):
             types.InlineKeyboardButton(display_text, callback_data=callback_data)
         )
 
-    bot.send_message(
-        call.message.chat.id, "Выбери марку автомобиля:", reply_markup=markup
-    )
+    show_step(call, "Выбери марку автомобиля:", reply_markup=markup)
 
 
 @bot.callback_query_handler(func=lambda call: call.data.startswith("brand_"))
+@wizard_step("encar_brand")
 def handle_brand_selection(call):
     _, eng_name, kr_name = call.data.split("_", 2)
+    show_loading(call)
     models = get_models_by_brand(kr_name)
     if not models:
-        bot.answer_callback_query(call.id, "Не удалось загрузить модели.")
+        restore_step(call, "Не удалось загрузить модели.")
         return
 
     markup = types.InlineKeyboardMarkup(row_width=2)
@@ -537,15 +780,15 @@ def handle_brand_selection(call):
             types.InlineKeyboardButton(display_text, callback_data=callback_data)
         )
 
-    bot.edit_message_text(
+    show_step(
+        call,
         f"Марка: {eng_name} ({kr_name})\nТеперь выбери модель:",
-        chat_id=call.message.chat.id,
-        message_id=call.message.message_id,
         reply_markup=markup,
     )
 
 
 @bot.callback_query_handler(func=lambda call: call.data.startswith("model_"))
+@wizard_step("encar_model")
 def handle_model_selection(call):
     _, model_eng, model_kr = call.data.split("_", 2)
     message_text = call.message.text
@@ -561,9 +804,10 @@ def handle_model_selection(call):
         brand_eng = brand_part
         brand_kr = ""
 
+    show_loading(call)
     generations = get_generations_by_model(brand_kr, model_kr)
     if not generations:
-        bot.answer_callback_query(call.id, "Не удалось загрузить поколения.")
+        restore_step(call, "Не удалось загрузить поколения.")
         return
 
     # Отладочный вывод данных о поколениях
@@ -606,15 +850,15 @@ def handle_model_selection(call):
             types.InlineKeyboardButton(display_text, callback_data=callback_data)
         )
 
-    bot.edit_message_text(
+    show_step(
+        call,
         f"Марка: {brand_eng.strip()} ({brand_kr})\nМодель: {model_eng} ({model_kr})\nТеперь выбери поколение:",
-        chat_id=call.message.chat.id,
-        message_id=call.message.message_id,
         reply_markup=markup,
     )
 
 
 @bot.callback_query_handler(func=lambda call: call.data.startswith("generation_"))
+@wizard_step("encar_generation")
 def handle_generation_selection(call):
     _, generation_eng, generation_kr = call.data.split("_", 2)
     message_text = call.message.text
@@ -650,7 +894,7 @@ def handle_generation_selection(call):
     )
 
     if not selected_generation:
-        bot.answer_callback_query(call.id, "Не удалось определить поколение.")
+        notify_callback(call, "Не удалось определить поколение.")
         return
 
     # Получаем даты начала и окончания поколения
@@ -685,9 +929,10 @@ def handle_generation_selection(call):
     # --- END DEBUGGING ---
 
     # Получаем комплектации
+    show_loading(call)
     trims = get_trims_by_generation(brand_kr, model_kr, generation_kr)
     if not trims:
-        bot.answer_callback_query(call.id, "Не удалось загрузить комплектации.")
+        restore_step(call, "Не удалось загрузить комплектации.")
         return
 
     markup = types.InlineKeyboardMarkup(row_width=2)
@@ -724,10 +969,9 @@ def handle_generation_selection(call):
     translated_generation_kr = translate_phrase(generation_kr)
 
     # Отображаем переведенные названия поколений в тексте сообщения
-    bot.edit_message_text(
+    show_step(
+        call,
         f"Марка: {brand_eng.strip()} ({brand_kr})\nМодель: {model_eng} ({model_kr})\nПоколение: {translated_generation_eng} ({translated_generation_kr})\nВыберите комплектацию:",
-        chat_id=call.message.chat.id,
-        message_id=call.message.message_id,
         reply_markup=markup,
     )
 
@@ -1004,10 +1248,9 @@ def handle_color_selection(call):
         reply_markup=markup,
     )
 
-    if user_id not in user_requests:
-        user_requests[user_id] = []
-
-    user_requests[user_id].append(
+    add_subscription(
+        user_id,
+        call.message.chat.id,
         {
             "manufacturer": manufacturer,
             "model_group": model_group,
@@ -1018,30 +1261,10 @@ def handle_color_selection(call):
             "mileage_from": mileage_from,
             "mileage_to": mileage_to,
             "color": selected_color_kr,
-        }
+        },
+        initial_results=config.ENCAR_INITIAL_RESULTS,
     )
 
-    save_requests(user_requests)
-
-    import threading
-
-    threading.Thread(
-        target=check_for_new_cars,
-        args=(
-            call.message.chat.id,
-            manufacturer.strip(),
-            model_group.strip(),
-            model.strip(),
-            trim.strip(),
-            year_from,
-            year_to,
-            mileage_from,
-            mileage_to,
-            selected_color_kr.strip(),
-        ),
-        daemon=True,
-    ).start()
-
 
 @bot.message_handler(state=CarForm.brand)
 def handle_brand(message):
@@ -1056,7 +1279,27 @@ def handle_model(message):
     bot.set_state(message.from_user.id, CarForm.generation, message.chat.id)
 
 
-checked_ids = set()
+# Уже отправленные объявления в разрезе подписок
+seen_store = SeenStore(
+    SEEN_FILE,
+    max_per_scope=config.SEEN_MAX_PER_REQUEST,
+    ttl=config.SEEN_TTL_DAYS * 24 * 3600,
+)
+
+# Характеристики авто Encar по ID и лимит параллельных запросов подробностей
+encar_details_cache = TTLCache(
+    maxsize=config.ENCAR_DETAILS_CACHE_SIZE, ttl=config.ENCAR_DETAILS_CACHE_TTL
+)
+encar_details_slots = asyncio.Semaphore(config.ENCAR_DETAILS_CONCURRENCY)
+
+# Запросы, первая проверка которых только запоминает текущую выдачу:
+# id запроса -> сколько самых свежих объявлений всё же прислать
+# (восстановленные после перезапуска и новые запросы KbChaChaCha/KCar — 0)
+priming_requests = {}
+
+# Подписчики по каноническому ключу запроса: url -> {id запроса: chat_id}
+query_subscribers = {}
+query_lock = threading.Lock()
 
 
 def build_encar_url(
@@ -1109,106 +1352,521 @@ def build_encar_url(
         f"(C.Model.{model_formatted_encoded}._.BadgeGroup.{trim_encoded}.))))_."
         f"Year.range({year_from_formatted}..{year_to_formatted})._."
         f"Mileage.range({mileage_from}..{mileage_to}).)"
-        f"&sr=%7CModifiedDate%7C0%7C1"
     )
 
     print(f"📡 Сформирован URL: {url}")
     return url
 
 
-def check_for_new_cars(
-    chat_id,
-    manufacturer,
-    model_group,
-    model,
-    trim,
-    year_from,
-    year_to,
-    mileage_from,
-    mileage_to,
-    color,
-):
-    url = build_encar_url(
-        manufacturer,
-        model_group,
-        model,
-        trim,
-        year_from,
-        year_to,
-        mileage_from,
-        mileage_to,
-        color,
+def encar_page_url(url, page):
+    """URL страницы каталога Encar: сортировка по дате изменения, page — с нуля"""
+    offset = page * config.ENCAR_PAGE_SIZE
+    return f"{url}&sr=%7CModifiedDate%7C{offset}%7C{config.ENCAR_PAGE_SIZE}"
+
+
+def encar_query_key(req):
+    """Канонический ключ запроса Encar — URL каталога по нормализованным параметрам"""
+    return build_encar_url(
+        req["manufacturer"].strip(),
+        req["model_group"].strip(),
+        req["model"].strip(),
+        req["trim"].strip(),
+        int(req["year_from"]),
+        int(req["year_to"]),
+        int(req["mileage_from"]),
+        int(req["mileage_to"]),
+        req["color"].strip(),
     )
 
-    while True:
-        try:
-            response = requests.get(url, headers={"User-Agent": "Mozilla/5.0"})
 
-            if response.status_code != 200:
-                print(f"❌ API вернул статус {response.status_code}: {response.text}")
-                time.sleep(300)
+def collect_new_listings(subscribers, listings, get_id):
+    """
+    Отбор объявлений, которые ещё не отправлялись подписчикам запроса.
+    Возвращает [(объявление, {id запроса: chat_id})]; для запросов в режиме
+    первичного заполнения объявления только запоминаются.
+    """
+    new_listings = []
+    still_listed = {request_id: [] for request_id in subscribers}
+    for listing in listings:
+        listing_id = get_id(listing)
+        if not listing_id:
+            continue
+        # Каждой подписке объявление отправляется один раз
+        recipients = {}
+        for request_id, chat_id in subscribers.items():
+            if seen_store.is_seen(request_id, listing_id):
+                still_listed[request_id].append(listing_id)
                 continue
+            if request_id in priming_requests:
+                if priming_requests[request_id] <= 0:
+                    seen_store.mark_seen(request_id, listing_id)
+                    continue
+                priming_requests[request_id] -= 1
+            recipients[request_id] = chat_id
+        if recipients:
+            new_listings.append((listing, recipients))
+    for request_id, listing_ids in still_listed.items():
+        if listing_ids:
+            seen_store.touch(request_id, listing_ids)
+    return new_listings
 
-            try:
-                data = response.json()
-            except Exception as json_err:
-                print(f"❌ Ошибка парсинга JSON: {json_err}")
-                print(f"Ответ: {response.text}")
-                time.sleep(300)
-                continue
 
-            cars = data.get("SearchResults", [])
-            new_cars = [car for car in cars if car["Id"] not in checked_ids]
+def finish_priming(subscribers):
+    """Завершение первичного заполнения после успешной проверки запроса"""
+    for request_id in subscribers:
+        priming_requests.pop(request_id, None)
 
-            for car in new_cars:
-                checked_ids.add(car["Id"])
-                details_url = f"https://api.encar.com/v1/readside/vehicle/{car['Id']}"
-                details_response = requests.get(
-                    details_url, headers={"User-Agent": "Mozilla/5.0"}
-                )
 
-                if details_response.status_code == 200:
-                    details_data = details_response.json()
-                    specs = details_data.get("spec", {})
-                    displacement = specs.get("displacement", "Не указано")
-                    extra_text = f"\nОбъём двигателя: {displacement}cc\n\n👉 <a href='https://fem.encar.com/cars/detail/{car['Id']}'>Ссылка на автомобиль</a>"
-                else:
-                    extra_text = "\nℹ️ Не удалось получить подробности о машине."
+# Отпечатки первой страницы выдачи по запросу: ETag/Last-Modified, если
+# площадка их присылает, и хэш последовательности ID объявлений. Новый
+# отпечаток сначала попадает в pending_page_validators и запоминается
+# только после успешной рассылки (commit_page_validators), иначе сбой на
+# второй странице или при отправке навсегда скрыл бы новые объявления
+page_validators = {}
+pending_page_validators = {}
 
-                name = f'{car.get("Manufacturer", "")} {car.get("Model", "")} {car.get("Badge", "")}'
-                price = car.get("Price", 0)
-                mileage = car.get("Mileage", 0)
-                year = car.get("FormYear", "")
+ENCAR_ID_PATTERN = re.compile(r'"Id"\s*:\s*"?(\d+)')
+KBCHA_ID_PATTERN = re.compile(r'data-car-seq="(\d+)"')
+KCAR_ID_PATTERN = re.compile(r'"(?:carCd|car_cd)"\s*:\s*"?([^",}]+)')
 
-                def format_number(n):
-                    return f"{int(n):,}".replace(",", " ")
 
-                formatted_mileage = format_number(mileage)
-                formatted_price = format_number(price * 10000)
+def full_check_due(key, subscribers):
+    """
+    Нужно ли разобрать выдачу целиком, даже если она не менялась: при
+    первичном заполнении и раз в seen_store.touch_interval, чтобы продлить
+    срок хранения объявлений, которые всё ещё продаются
+    """
+    if any(request_id in priming_requests for request_id in subscribers):
+        return True
+    validators = page_validators.get(key)
+    return (
+        validators is None
+        or time.time() - validators.get("checked_at", 0) >= seen_store.touch_interval
+    )
 
-                text = (
-                    f"✅ Новое поступление по вашему запросу!\n\n<b>{name}</b> {year} г.\nПробег: {formatted_mileage} км\nЦена: ₩{formatted_price}"
-                    + extra_text
-                )
-                markup = types.InlineKeyboardMarkup()
-                markup.add(
-                    types.InlineKeyboardButton(
-                        "➕ Добавить новый автомобиль в поиск",
-                        callback_data="search_car",
-                    )
-                )
-                markup.add(
-                    types.InlineKeyboardButton(
-                        "🏠 Вернуться в главное меню",
-                        callback_data="start",
-                    )
-                )
-                bot.send_message(chat_id, text, parse_mode="HTML", reply_markup=markup)
 
-            time.sleep(300)
+def conditional_headers(key, subscribers, headers):
+    """Заголовки условного запроса первой страницы (если они известны)"""
+    validators = page_validators.get(key)
+    if not validators or full_check_due(key, subscribers):
+        return headers
+    headers = dict(headers)
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+
+def page_unchanged(key, subscribers, response, id_pattern):
+    """
+    Не изменилась ли первая страница выдачи с прошлой проверки: ответ 304
+    или та же последовательность ID. Тогда новых объявлений нет и разбирать
+    ответ не нужно. Если пора разобрать выдачу целиком (full_check_due),
+    всегда False.
+    """
+    if response.status_code == 304:
+        return True
+    if response.status_code != 200:
+        return False
+
+    ids = id_pattern.findall(response.text)
+    digest = (
+        hashlib.blake2b(",".join(ids).encode(), digest_size=16).hexdigest()
+        if ids
+        else None
+    )
+    previous = page_validators.get(key, {})
+    validators = {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "digest": digest,
+        "checked_at": previous.get("checked_at", 0),
+    }
+    pending_page_validators[key] = validators
+    if (
+        not full_check_due(key, subscribers)
+        and digest is not None
+        and digest == previous.get("digest")
+    ):
+        return True
+    # Выдача будет разобрана целиком
+    validators["checked_at"] = time.time()
+    return False
+
+
+def commit_page_validators(key):
+    """Запоминание отпечатка первой страницы после успешной проверки запроса"""
+    validators = pending_page_validators.pop(key, None)
+    if validators is not None:
+        page_validators[key] = validators
+
+
+def page_reaches_seen(subscribers, listings, get_id):
+    """
+    Есть ли на странице объявление, уже известное всем подписчикам запроса.
+    Выдача отсортирована по новизне, поэтому дальше листать не нужно.
+    """
+    for listing in listings:
+        listing_id = get_id(listing)
+        if listing_id and all(
+            request_id in priming_requests or seen_store.is_seen(request_id, listing_id)
+            for request_id in subscribers
+        ):
+            return True
+    return False
+
+
+def new_listing_markup():
+    """Кнопки под уведомлением о новом поступлении"""
+    markup = types.InlineKeyboardMarkup()
+    markup.add(
+        types.InlineKeyboardButton(
+            "➕ Добавить новый автомобиль в поиск",
+            callback_data="search_car",
+        )
+    )
+    markup.add(
+        types.InlineKeyboardButton(
+            "🏠 Вернуться в главное меню",
+            callback_data="start",
+        )
+    )
+    return markup
+
+
+def digest_line(title, details, link, link_text="Ссылка на автомобиль"):
+    """Строка сводного сообщения (и подпись фото в альбоме) об одном авто"""
+    return f"🚗 <b>{title}</b>\n{details}\n👉 <a href='{link}'>{link_text}</a>"
+
+
+def send_listing_batch(chat_id, listings, header, markup=None):
+    """
+    Отправка нескольких авто в один чат: listings — список (text, img_url, line).
+    Одно авто уходит обычной карточкой, несколько — альбомами до
+    MEDIA_GROUP_SIZE фото (строка авто — подпись к его фото). Авто без фото
+    и кнопки приходят одним коротким сообщением после альбомов, так что
+    каждое авто присылается ровно один раз.
+    """
+    if len(listings) == 1:
+        text, img_url, _ = listings[0]
+        if img_url:
+            send_queue.send_photo(
+                chat_id, img_url, caption=text, parse_mode="HTML", reply_markup=markup
+            )
+        else:
+            send_queue.send_message(chat_id, text, parse_mode="HTML", reply_markup=markup)
+        return
+
+    photos = [(img_url, line) for _, img_url, line in listings if img_url]
+    for start in range(0, len(photos), MEDIA_GROUP_SIZE):
+        album = photos[start : start + MEDIA_GROUP_SIZE]
+        if len(album) == 1:
+            send_queue.send_photo(chat_id, album[0][0], caption=album[0][1], parse_mode="HTML")
+        else:
+            send_queue.send_media_group(
+                chat_id,
+                [
+                    types.InputMediaPhoto(img_url, caption=line, parse_mode="HTML")
+                    for img_url, line in album
+                ],
+            )
+
+    without_photo = [line for _, img_url, line in listings if not img_url]
+    if not without_photo and markup is None:
+        return
+
+    # Сообщение делится на части по лимиту длины сообщения Telegram
+    chunks = [header]
+    for line in without_photo:
+        if len(chunks[-1]) + len(line) + 2 > MESSAGE_MAX_LENGTH:
+            chunks.append("")
+        chunks[-1] += line + "\n\n"
+    for index, chunk in enumerate(chunks):
+        send_queue.send_message(
+            chat_id,
+            chunk.strip(),
+            parse_mode="HTML",
+            disable_web_page_preview=True,
+            reply_markup=markup if index == len(chunks) - 1 else None,
+        )
+
+
+def deliver_listings(notifications, header):
+    """
+    Рассылка новых объявлений, найденных за одну проверку запроса.
+    notifications — список (listing_id, recipients, text, img_url, line);
+    авто группируются по чатам, так что несколько поступлений сразу
+    приходят одним альбомом, а не отдельным сообщением на авто.
+    """
+    by_chat = {}
+    for listing_id, recipients, text, img_url, line in notifications:
+        for request_id, chat_id in recipients.items():
+            seen_store.mark_seen(request_id, listing_id)
+            # Одно авто по нескольким запросам чата присылаем один раз
+            by_chat.setdefault(chat_id, {}).setdefault(listing_id, (text, img_url, line))
+
+    for chat_id, listings in by_chat.items():
+        listings = list(listings.values())
+        send_listing_batch(
+            chat_id,
+            listings,
+            header.format(count=len(listings)),
+            markup=new_listing_markup(),
+        )
+
+
+async def fetch_encar_details(vehicle_id):
+    """
+    Характеристики авто с api.encar.com (раздел spec) или None при ошибке.
+    Одновременных запросов не больше ENCAR_DETAILS_CONCURRENCY, ответы
+    кэшируются по ID авто, так как одно авто приходит в несколько запросов.
+    """
+    specs = encar_details_cache.get(vehicle_id)
+    if specs is not None:
+        return specs
+
+    details_url = f"https://api.encar.com/v1/readside/vehicle/{vehicle_id}"
+    try:
+        async with encar_details_slots:
+            response = await monitor_http.get(
+                details_url, headers={"User-Agent": "Mozilla/5.0"}
+            )
+        if response.status_code != 200:
+            return None
+        specs = response.json().get("spec", {})
+    except Exception as e:
+        print(f"⚠️ Не удалось получить подробности авто {vehicle_id}: {e}")
+        return None
+
+    encar_details_cache.set(vehicle_id, specs)
+    return specs
+
+
+async def fetch_encar_listings(url, subscribers):
+    """
+    Объявления Encar по запросу, от новых к старым: страницы листаются, пока
+    не встретится уже отправленное авто (не больше MONITOR_MAX_PAGES).
+    Пустой список — если первая страница не изменилась с прошлой проверки,
+    None — если не удалось получить даже первую страницу.
+    """
+    cars = []
+    for page in range(config.MONITOR_MAX_PAGES):
+        headers = {"User-Agent": "Mozilla/5.0"}
+        if page == 0:
+            headers = conditional_headers(url, subscribers, headers)
+        response = await monitor_http.get(encar_page_url(url, page), headers=headers)
+        if page == 0 and page_unchanged(url, subscribers, response, ENCAR_ID_PATTERN):
+            return []
+
+        if response.status_code != 200:
+            print(f"❌ API вернул статус {response.status_code}: {response.text}")
+            return cars if page else None
+
+        try:
+            data = response.json()
+        except Exception as json_err:
+            print(f"❌ Ошибка парсинга JSON: {json_err}")
+            print(f"Ответ: {response.text}")
+            return cars if page else None
+
+        page_cars = data.get("SearchResults", [])
+        cars.extend(page_cars)
+        if len(page_cars) < config.ENCAR_PAGE_SIZE or page_reaches_seen(
+            subscribers, page_cars, lambda car: car.get("Id")
+        ):
+            break
+    return cars
+
+
+async def run_check(url, fetch, get_id, build_notifications, header, platform):
+    """
+    Одна проверка новых авто по запросу (корутина движка мониторинга).
+    Выдача запрашивается один раз (fetch(url, subscribers), None — проверка
+    не удалась), а новые объявления рассылаются всем подписчикам с таким же
+    запросом. Возвращает интервал до следующей проверки по наблюдаемой
+    частоте новых объявлений.
+    """
+    with query_lock:
+        subscribers = dict(query_subscribers.get(url, {}))
+    if not subscribers:
+        return
+
+    try:
+        cars = await fetch(url, subscribers)
+        if cars is None:
+            return
+
+        new_cars = collect_new_listings(subscribers, cars, get_id)
+        deliver_listings(await build_notifications(new_cars), header)
+
+        finish_priming(subscribers)
+        commit_page_validators(url)
+        return monitor_intervals.observe(url, len(new_cars))
+    except CircuitOpenError as e:
+        # Площадка недоступна: следующая проверка не раньше конца паузы
+        return max(e.retry_after, monitor_intervals.interval(url))
+    except Exception as e:
+        print(f"🔧 Ошибка при проверке новых авто {platform}: {e}")
+    finally:
+        pending_page_validators.pop(url, None)
+        # Коммит SQLite с fsync и очистка не должны держать цикл мониторинга
+        await asyncio.to_thread(seen_store.save)
+
+
+async def encar_notifications(new_cars):
+    """Уведомления о новых авто Encar для deliver_listings"""
+    # Подробности по всем новым авто запрашиваем параллельно
+    details_list = await asyncio.gather(
+        *(fetch_encar_details(car["Id"]) for car, _ in new_cars)
+    )
+
+    notifications = []
+    for (car, recipients), specs in zip(new_cars, details_list):
+        if specs is not None:
+            displacement = specs.get("displacement", "Не указано")
+            extra_text = f"\nОбъём двигателя: {displacement}cc\n\n👉 <a href='https://fem.encar.com/cars/detail/{car['Id']}'>Ссылка на автомобиль</a>"
+        else:
+            extra_text = "\nℹ️ Не удалось получить подробности о машине."
+
+        name = f'{car.get("Manufacturer", "")} {car.get("Model", "")} {car.get("Badge", "")}'
+        price = car.get("Price", 0)
+        mileage = car.get("Mileage", 0)
+        year = car.get("FormYear", "")
+
+        def format_number(n):
+            return f"{int(n):,}".replace(",", " ")
+
+        formatted_mileage = format_number(mileage)
+        formatted_price = format_number(price * 10000)
+
+        text = (
+            f"✅ Новое поступление по вашему запросу!\n\n<b>{name}</b> {year} г.\nПробег: {formatted_mileage} км\nЦена: ₩{formatted_price}"
+            + extra_text
+        )
+        line = digest_line(
+            f"{name} {year} г.",
+            f"Пробег: {formatted_mileage} км, цена: ₩{formatted_price}",
+            f"https://fem.encar.com/cars/detail/{car['Id']}",
+        )
+        notifications.append((car["Id"], recipients, text, None, line))
+    return notifications
+
+
+async def check_for_new_cars(url):
+    """Проверка запроса Encar; ID объявления — поле Id"""
+    return await run_check(
+        url,
+        fetch_encar_listings,
+        lambda car: car.get("Id"),
+        encar_notifications,
+        "✅ Новые поступления по вашему запросу: {count}\n\n",
+        "Encar",
+    )
+
+
+def add_subscription(user_id, chat_id, req, initial_results=None):
+    """
+    Сохранение нового запроса пользователя и постановка его на мониторинг.
+    Если задан initial_results, первая проверка присылает только столько
+    самых свежих объявлений, а остальную выдачу просто запоминает.
+    """
+    subscription_store.add(user_id, req)
+
+    if initial_results is not None:
+        priming_requests[req["id"]] = initial_results
+    if not schedule_request(chat_id, req):
+        # Запрос уже отслеживается, и следующая проверка может быть через
+        # MONITOR_MAX_INTERVAL — а до первичного заполнения новой подписки
+        # пришедшие объявления молча запоминались бы как отправленные
+        monitor_scheduler.reschedule(monitor_target(req)[0], delay=0)
+    return req
+
+
+def monitor_target(req):
+    """Канонический ключ запроса и корутина проверки для площадки запроса"""
+    platform = req.get("platform", "encar")
+    if platform == "kbchachacha":
+        return kbcha_query_key(req), check_for_new_kbcha_cars
+    if platform == "kcar":
+        return kcar_query_key(req), check_for_new_kcar_cars
+    return encar_query_key(req), check_for_new_cars
+
+
+def schedule_request(chat_id, req, delay=0):
+    """
+    Подписка сохранённого запроса на мониторинг.
+    Одинаковые запросы разных пользователей обслуживаются одной задачей
+    планировщика; возвращает True, если задача для запроса создана.
+    """
+    url, check = monitor_target(req)
+    if not url:
+        print(f"⚠️ Запрос {req.get('id')} пропущен: неполные параметры")
+        return False
+
+    with query_lock:
+        subscribers = query_subscribers.setdefault(url, {})
+        is_new_query = not subscribers
+        subscribers[req["id"]] = chat_id
+
+    if is_new_query:
+        monitor_scheduler.add_job(
+            url,
+            functools.partial(check, url),
+            config.MONITOR_INTERVAL,
+            delay=delay,
+        )
+    return is_new_query
+
+
+def unschedule_request(req):
+    """Отписка запроса от мониторинга; задача удаляется вместе с последним подписчиком"""
+    seen_store.drop_scope(req.get("id"))
+    url, _ = monitor_target(req)
+    with query_lock:
+        subscribers = query_subscribers.get(url)
+        if subscribers is None:
+            return
+        subscribers.pop(req.get("id"), None)
+        if subscribers:
+            return
+        del query_subscribers[url]
+    monitor_scheduler.remove_job(url)
+    monitor_intervals.forget(url)
+    page_validators.pop(url, None)
+
+
+def resume_monitoring():
+    """
+    Восстановление мониторинга всех сохранённых запросов после перезапуска.
+    Первые проверки равномерно распределяются по интервалу опроса,
+    чтобы не отправлять сотни запросов к прокси одновременно.
+    """
+    saved = subscription_store.all()
+    for _, req in saved:
+        if not seen_store.has_history(req["id"]):
+            priming_requests[req["id"]] = 0
+
+    if not saved:
+        return 0
+
+    # Разносим по интервалу уникальные запросы, а не отдельные подписки
+    distinct_queries = set()
+    for _, req in saved:
+        try:
+            distinct_queries.add(monitor_target(req)[0])
+        except Exception:
+            continue
+    step = config.MONITOR_INTERVAL / max(len(distinct_queries), 1)
+
+    job_index = 0
+    for chat_id, req in saved:
+        try:
+            if schedule_request(chat_id, req, delay=job_index * step):
+                job_index += 1
         except Exception as e:
-            print(f"🔧 Общая ошибка при проверке новых авто: {e}")
-            time.sleep(300)
+            print(f"⚠️ Не удалось восстановить запрос {req.get('id')}: {e}")
+    return len(saved)
 
 
 # Добавленный код для команд userlist и remove_user
@@ -1257,7 +1915,34 @@ def handle_remove_user(message):
         bot.reply_to(message, f"⚠️ Ошибка: {e}")
 
 
+@bot.message_handler(commands=["stats"])
+def handle_stats_command(message):
+    """Время шагов мастера поиска и загрузка очередей бота"""
+    if message.from_user.id not in [MANAGER, 604303416, 728438182]:
+        bot.reply_to(message, "❌ У вас нет доступа к этой команде.")
+        return
+
+    pending, peak = update_pool.stats()
+    text = (
+        "📊 <b>Состояние бота</b>\n\n"
+        f"Очередь обработчиков: {pending} (максимум {peak})\n"
+        f"Очередь отправки: {send_queue.pending()}\n"
+        f"Запросов на мониторинге: {len(monitor_scheduler.job_ids())}\n\n"
+        "<b>Шаги мастера поиска</b> (p50 / p95 / макс, с):\n"
+    )
+    rows = wizard_latency.summary()
+    if not rows:
+        text += "пока нет данных"
+    for row in rows:
+        text += (
+            f"• {row['step']}: {row['count']} шт., "
+            f"{row['p50']:.2f} / {row['p95']:.2f} / {row['max']:.2f}\n"
+        )
+    bot.send_message(message.chat.id, text, parse_mode="HTML")
+
+
 # Функции для работы с KbChaChaCha
+@catalog_cached("kbcha_manufacturers")
 def get_kbchachacha_manufacturers():
     """Получение списка производителей с KbChaChaCha"""
     url = (
@@ -1265,7 +1950,7 @@ def get_kbchachacha_manufacturers():
     )
     headers = {"User-Agent": "Mozilla/5.0"}
     try:
-        response = requests.get(url, headers=headers)
+        response = http_client.get(url, headers=headers)
         data = response.json()
         # Получаем список как импортных, так и корейских производителей
         import_manufacturers = data.get("result", {}).get(
@@ -1287,12 +1972,13 @@ def get_kbchachacha_manufacturers():
         return []
 
 
+@catalog_cached("kbcha_models")
 def get_kbchachacha_models(maker_code):
     """Получение списка моделей по ID производителя с KbChaChaCha"""
     url = f"https://www.kbchachacha.com/public/search/carClass.json?makerCode={maker_code}&page=1&sort=-orderDate"
     headers = {"User-Agent": "Mozilla/5.0"}
     try:
-        response = requests.get(url, headers=headers)
+        response = http_client.get(url, headers=headers)
         data = response.json()
         models = data.get("result", {}).get("code", [])
         # Сортируем по имени модели
@@ -1308,7 +1994,7 @@ def get_kbchachacha_generations(maker_code, class_code):
     url = f"https://www.kbchachacha.com/public/search/carName.json?makerCode={maker_code}&page=1&sort=-orderDate&classCode={class_code}"
     headers = {"User-Agent": "Mozilla/5.0"}
     try:
-        response = requests.get(url, headers=headers)
+        response = http_client.get(url, headers=headers)
         data = response.json()
         generations = data.get("result", {}).get("code", [])
         # Сортируем по порядку поколений
@@ -1327,7 +2013,7 @@ def get_kbchachacha_trims(maker_code, class_code, car_code):
     url = f"https://www.kbchachacha.com/public/search/carModel.json?makerCode={maker_code}&page=1&sort=-orderDate&classCode={class_code}&carCode={car_code}"
     headers = {"User-Agent": "Mozilla/5.0"}
     try:
-        response = requests.get(url, headers=headers)
+        response = http_client.get(url, headers=headers)
         data = response.json()
         trims = data.get("result", {}).get("codeModel", [])
         # Сортируем по порядку конфигураций
@@ -1342,10 +2028,11 @@ def get_kbchachacha_trims(maker_code, class_code, car_code):
 
 
 def handle_kbchachacha_search(call):
+    show_loading(call)
     # Получаем список производителей
     manufacturers = get_kbchachacha_manufacturers()
     if not manufacturers:
-        bot.answer_callback_query(call.id, "Не удалось загрузить марки из KbChaChaCha.")
+        restore_step(call, "Не удалось загрузить марки из KbChaChaCha.")
         return
 
     # Создаем клавиатуру с марками
@@ -1366,14 +2053,15 @@ def handle_kbchachacha_search(call):
             types.InlineKeyboardButton(display_name, callback_data=callback_data)
         )
 
-    bot.send_message(
-        call.message.chat.id,
+    show_step(
+        call,
         "Выберите марку автомобиля:",
         reply_markup=markup,
     )
 
 
 @bot.callback_query_handler(func=lambda call: call.data.startswith("kbcha_brand_"))
+@wizard_step("kbcha_brand")
 def handle_kbcha_brand_selection(call):
     # Парсим данные из callback_data
     parts = call.data.split("_", 3)
@@ -1392,11 +2080,10 @@ def handle_kbcha_brand_selection(call):
     translated_maker_name = translations.get(maker_name, maker_name)
 
     # Получаем список моделей для выбранной марки
+    show_loading(call)
     models = get_kbchachacha_models(maker_code)
     if not models:
-        bot.send_message(
-            call.message.chat.id, f"Не удалось загрузить модели для {maker_name}"
-        )
+        restore_step(call, f"Не удалось загрузить модели для {maker_name}")
         return
 
     # Создаем клавиатуру с моделями
@@ -1419,14 +2106,15 @@ def handle_kbcha_brand_selection(call):
     # Отображаем только переведенное название марки
     display_maker_name = translated_maker_name
 
-    bot.send_message(
-        call.message.chat.id,
+    show_step(
+        call,
         f"Марка: {display_maker_name}\nВыберите модель:",
         reply_markup=markup,
     )
 
 
 @bot.callback_query_handler(func=lambda call: call.data.startswith("kbcha_model_"))
+@wizard_step("kbcha_model")
 def handle_kbcha_model_selection(call):
     # Парсим данные из callback_data
     parts = call.data.split("_", 3)
@@ -1450,11 +2138,10 @@ def handle_kbcha_model_selection(call):
     translated_maker_name = translations.get(maker_name, maker_name)
 
     # Получаем список поколений для выбранной модели
+    show_loading(call)
     generations = get_kbchachacha_generations(maker_code, class_code)
     if not generations:
-        bot.send_message(
-            call.message.chat.id, f"Не удалось загрузить поколения для {class_name}"
-        )
+        restore_step(call, f"Не удалось загрузить поколения для {class_name}")
         return
 
     # Создаем клавиатуру с поколениями
@@ -1497,106 +2184,182 @@ def handle_kbcha_model_selection(call):
         else class_name
     )
 
-    bot.send_message(
-        call.message.chat.id,
+    show_step(
+        call,
         f"Марка: {display_maker_name}\nМодель: {display_class_name}\nВыберите поколение:",
         reply_markup=markup,
     )
 
 
-def search_kbchachacha_cars(
-    maker_code,
-    class_code,
-    car_code,
-    model_code,
-    year_from=None,
-    year_to=None,
-    mileage_from=None,
-    mileage_to=None,
-    color_code=None,
-):
-    """
-    Поиск автомобилей на KbChaChaCha
-    """
-    # Базовый URL для поиска
-    url = f"https://www.kbchachacha.com/public/search/list.empty?makerCode={maker_code}&page=1&sort=-orderDate&classCode={class_code}&carCode={car_code}&modelCode={model_code}"
+KBCHA_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+
+def build_kbcha_search_url(
+    maker_code,
+    class_code,
+    car_code,
+    model_code,
+    year_from=None,
+    year_to=None,
+    mileage_from=None,
+    mileage_to=None,
+    color_code=None,
+):
+    """URL списка объявлений KbChaChaCha (сортировка по дате, новые первыми)"""
+    url = f"https://www.kbchachacha.com/public/search/list.empty?makerCode={maker_code}&page=1&sort=-orderDate&classCode={class_code}&carCode={car_code}&modelCode={model_code}"
+
+    # Добавляем дополнительные параметры, если они указаны
+    if year_from and year_to:
+        url += f"&regiDay={year_from},{year_to}"
+
+    if mileage_from is not None and mileage_to is not None:
+        url += f"&km={mileage_from},{mileage_to}"
+
+    if color_code:
+        url += f"&color={color_code}"
+
+    return url
+
+
+def search_kbchachacha_cars(
+    maker_code,
+    class_code,
+    car_code,
+    model_code,
+    year_from=None,
+    year_to=None,
+    mileage_from=None,
+    mileage_to=None,
+    color_code=None,
+):
+    """
+    Поиск автомобилей на KbChaChaCha
+    """
+    url = build_kbcha_search_url(
+        maker_code,
+        class_code,
+        car_code,
+        model_code,
+        year_from,
+        year_to,
+        mileage_from,
+        mileage_to,
+        color_code,
+    )
+
+    try:
+        print(f"DEBUG: Отправка запроса на URL: {url}")
+        response = http_client.get(url, headers=KBCHA_HEADERS)
+        return parse_kbchachacha_cars(response.text, limit=5)
+    except Exception as e:
+        print(f"Ошибка при поиске автомобилей на KbChaChaCha: {e}")
+        return []
+
 
-    # Добавляем дополнительные параметры, если они указаны
-    if year_from and year_to:
-        url += f"&regiDay={year_from},{year_to}"
+def kbcha_query_key(req):
+    """Канонический ключ запроса KbChaChaCha — URL списка объявлений"""
+    return build_kbcha_search_url(
+        req["maker_code"],
+        req["class_code"],
+        req["car_code"],
+        req["model_code"],
+        req["year_from"],
+        req["year_to"],
+        req["mileage_from"],
+        req["mileage_to"],
+        req.get("color_code") or None,
+    )
 
-    if mileage_from is not None and mileage_to is not None:
-        url += f"&km={mileage_from},{mileage_to}"
 
-    if color_code:
-        url += f"&color={color_code}"
+def format_kbcha_car(car, header=""):
+    """Текст карточки авто KbChaChaCha"""
+    return (
+        f"{header}"
+        f"🚗 <b>{car['title']}</b>\n"
+        f"📆 Год: {car['year']}\n"
+        f"🏁 Пробег: {car['mileage']}\n"
+        f"📍 Регион: {car['region']}\n"
+        f"💰 Цена: {car['price']}만원\n\n"
+        f"🔗 <a href='{car['link']}'>Подробнее на KbChaChaCha</a>"
+    )
 
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    }
 
-    try:
-        print(f"DEBUG: Отправка запроса на URL: {url}")
-        response = requests.get(url, headers=headers)
-        soup = BeautifulSoup(response.text, "html.parser")
+def kbcha_digest_line(car):
+    """Строка сводки об авто KbChaChaCha"""
+    return digest_line(
+        car["title"],
+        f"{car['year']}, {car['mileage']}, {car['price']}만원",
+        car["link"],
+        "Подробнее на KbChaChaCha",
+    )
 
-        # Ищем все блоки с автомобилями
-        car_areas = soup.select("div.list-in.type-wd-list div.area")
 
-        results = []
-        for area in car_areas[:5]:  # Ограничиваем до 5 результатов
-            try:
-                # Извлекаем данные об автомобиле
-                car_seq = area.get("data-car-seq", "")
-                car_link = f"https://www.kbchachacha.com/public/car/detail.kbc?carSeq={car_seq}"
-
-                # Извлекаем название автомобиля
-                car_title = area.select_one("div.con div.item strong.tit")
-                title = car_title.text.strip() if car_title else "Неизвестно"
-
-                # Извлекаем данные о годе, пробеге и регионе
-                data_line = area.select_one("div.con div.item div.data-line")
-                details = (
-                    [span.text.strip() for span in data_line.select("span")]
-                    if data_line
-                    else []
-                )
-                year = details[0] if len(details) > 0 else "Неизвестно"
-                mileage = details[1] if len(details) > 1 else "Неизвестно"
-                region = details[2] if len(details) > 2 else "Неизвестно"
+async def fetch_kbcha_listings(url, subscribers):
+    """
+    Объявления KbChaChaCha по запросу (sort=-orderDate, новые первыми):
+    страницы листаются до уже отправленного авто, не больше MONITOR_MAX_PAGES.
+    Пустой список — если первая страница не изменилась с прошлой проверки,
+    None — если не удалось получить даже первую страницу.
+    """
+    cars = []
+    known_seqs = set()
+    for page in range(1, config.MONITOR_MAX_PAGES + 1):
+        page_url = re.sub(r"([?&]page=)\d+", rf"\g<1>{page}", url, count=1)
+        headers = KBCHA_HEADERS
+        if page == 1:
+            headers = conditional_headers(url, subscribers, headers)
+        response = await monitor_http.get(page_url, headers=headers)
+        if page == 1 and page_unchanged(url, subscribers, response, KBCHA_ID_PATTERN):
+            return []
+        if response.status_code != 200:
+            print(f"❌ KbChaChaCha вернул статус {response.status_code}")
+            return cars if page > 1 else None
+
+        # Разбор HTML выполняем вне цикла событий
+        page_cars = await asyncio.to_thread(parse_kbchachacha_cars, response.text)
+        page_cars = [car for car in page_cars if car["car_seq"] not in known_seqs]
+        if not page_cars:
+            break
+        known_seqs.update(car["car_seq"] for car in page_cars)
+        cars.extend(page_cars)
+        if page_reaches_seen(subscribers, page_cars, lambda car: car.get("car_seq")):
+            break
+    return cars
+
+
+async def kbcha_notifications(new_cars):
+    """Уведомления о новых авто KbChaChaCha для deliver_listings"""
+    return [
+        (
+            car["car_seq"],
+            recipients,
+            format_kbcha_car(
+                car,
+                header="✅ Новое поступление на KbChaChaCha по вашему запросу!\n\n",
+            ),
+            car["img_url"],
+            kbcha_digest_line(car),
+        )
+        for car, recipients in new_cars
+    ]
 
-                # Извлекаем цену
-                price_elem = area.select_one(
-                    "div.con div.item div.sort-wrap strong.pay span.price"
-                )
-                price = price_elem.text.strip() if price_elem else "Неизвестно"
-
-                # Получаем ссылку на изображение
-                img_elem = area.select_one("div.thumnail a.item span.item__img img")
-                img_url = img_elem.get("src", "") if img_elem else ""
-
-                results.append(
-                    {
-                        "title": title,
-                        "year": year,
-                        "mileage": mileage,
-                        "region": region,
-                        "price": price,
-                        "link": car_link,
-                        "img_url": img_url,
-                    }
-                )
-            except Exception as e:
-                print(f"Ошибка при парсинге автомобиля: {e}")
-                continue
 
-        return results
-    except Exception as e:
-        print(f"Ошибка при поиске автомобилей на KbChaChaCha: {e}")
-        return []
+async def check_for_new_kbcha_cars(url):
+    """Проверка запроса KbChaChaCha; новые объявления определяются по data-car-seq"""
+    return await run_check(
+        url,
+        fetch_kbcha_listings,
+        lambda car: car.get("car_seq"),
+        kbcha_notifications,
+        "✅ Новые поступления на KbChaChaCha по вашему запросу: {count}\n\n",
+        "KbChaChaCha",
+    )
 
 
 @bot.callback_query_handler(func=lambda call: call.data.startswith("kbcha_gen_"))
+@wizard_step("kbcha_generation")
 def handle_kbcha_generation_selection(call):
     # Парсим данные из callback_data
     parts = call.data.split("_", 3)
@@ -1626,11 +2389,10 @@ def handle_kbcha_generation_selection(call):
     translated_class_name = translations.get(class_name, class_name)
 
     # Получаем список конфигураций для выбранного поколения
+    show_loading(call)
     trims = get_kbchachacha_trims(maker_code, class_code, car_code)
     if not trims:
-        bot.send_message(
-            call.message.chat.id, f"Не удалось загрузить конфигурации для {car_name}"
-        )
+        restore_step(call, f"Не удалось загрузить конфигурации для {car_name}")
         return
 
     # Создаем клавиатуру с конфигурациями
@@ -1672,8 +2434,8 @@ def handle_kbcha_generation_selection(call):
         else car_name
     )
 
-    bot.send_message(
-        call.message.chat.id,
+    show_step(
+        call,
         f"Марка: {display_maker_name}\nМодель: {display_class_name}\nПоколение: {display_car_name}\nВыберите конфигурацию:",
         reply_markup=markup,
     )
@@ -1952,6 +2714,7 @@ def handle_kbcha_mileage_to_selection(call):
 
 
 @bot.callback_query_handler(func=lambda call: call.data.startswith("kbcha_color_"))
+@wizard_step("kbcha_search")
 def handle_kbcha_color_selection(call):
     # Парсим выбранный цвет
     color_kr = call.data.split("_")[2]
@@ -2005,6 +2768,31 @@ def handle_kbcha_color_selection(call):
         color_code if color_code else None,
     )
 
+    # Сохраняем запрос для отслеживания новых поступлений; уже найденные
+    # авто запоминаются при первой проверке и повторно не присылаются
+    add_subscription(
+        user_id,
+        call.message.chat.id,
+        {
+            "platform": "kbchachacha",
+            "maker_code": maker_code,
+            "maker_name": maker_name,
+            "class_code": class_code,
+            "class_name": class_name,
+            "car_code": car_code,
+            "car_name": car_name,
+            "model_code": model_code,
+            "model_name": model_name,
+            "year_from": year_from,
+            "year_to": year_to,
+            "mileage_from": mileage_from,
+            "mileage_to": mileage_to,
+            "color": color_kr,
+            "color_code": color_code,
+        },
+        initial_results=0,
+    )
+
     if not cars:
         # Отправляем сообщение, если автомобили не найдены
         markup = types.InlineKeyboardMarkup(row_width=1)
@@ -2028,33 +2816,24 @@ def handle_kbcha_color_selection(call):
             f"Конфигурация: {model_name}\n"
             f"Год: {year_from}-{year_to}\n"
             f"Пробег: {mileage_from}-{mileage_to} км\n"
-            f"Цвет: {color_ru}",
+            f"Цвет: {color_ru}\n\n"
+            f"🔔 Запрос сохранён — мы сообщим о новых поступлениях.",
             reply_markup=markup,
         )
         return
 
     # Отправляем только первый найденный автомобиль
     car = cars[0]
-    caption = (
-        f"🚗 <b>{car['title']}</b>\n"
-        f"📆 Год: {car['year']}\n"
-        f"🏁 Пробег: {car['mileage']}\n"
-        f"📍 Регион: {car['region']}\n"
-        f"💰 Цена: {car['price']}만원\n\n"
-        f"🔗 <a href='{car['link']}'>Подробнее на KbChaChaCha</a>"
-    )
+    caption = format_kbcha_car(car)
 
     # Отправляем изображение если есть, или текст если изображения нет
-    if car["img_url"] and car["img_url"] != "":
-        try:
-            bot.send_photo(
-                call.message.chat.id, car["img_url"], caption=caption, parse_mode="HTML"
-            )
-        except Exception:
-            # Если не удалось отправить фото, отправляем только текст
-            bot.send_message(call.message.chat.id, caption, parse_mode="HTML")
+    # (через очередь, как и сообщение с кнопками ниже, чтобы сохранить порядок)
+    if car["img_url"]:
+        send_queue.send_photo(
+            call.message.chat.id, car["img_url"], caption=caption, parse_mode="HTML"
+        )
     else:
-        bot.send_message(call.message.chat.id, caption, parse_mode="HTML")
+        send_queue.send_message(call.message.chat.id, caption, parse_mode="HTML")
 
     # Отправляем кнопки для дальнейших действий
     markup = types.InlineKeyboardMarkup(row_width=1)
@@ -2067,7 +2846,7 @@ def handle_kbcha_color_selection(call):
         types.InlineKeyboardButton("🏠 Вернуться в главное меню", callback_data="start")
     )
 
-    bot.send_message(
+    send_queue.send_message(
         call.message.chat.id,
         f"✅ Показан результат поиска по запросу:\n\n"
         f"Марка: {maker_name}\n"
@@ -2076,12 +2855,14 @@ def handle_kbcha_color_selection(call):
         f"Конфигурация: {model_name}\n"
         f"Год: {year_from}-{year_to}\n"
         f"Пробег: {mileage_from}-{mileage_to} км\n"
-        f"Цвет: {color_ru}",
+        f"Цвет: {color_ru}\n\n"
+        f"🔔 Запрос сохранён — мы сообщим о новых поступлениях.",
         reply_markup=markup,
     )
 
 
 # Функции для работы с KCar
+@catalog_cached("kcar_manufacturers")
 def get_kcar_manufacturers():
     """Получение списка производителей с KCar"""
     url = "https://api.kcar.com/bc/search/group/mnuftr"
@@ -2092,7 +2873,7 @@ def get_kcar_manufacturers():
     payload = {"wr_eq_sell_dcd": "ALL", "wr_in_multi_columns": "cntr_rgn_cd|cntr_cd"}
 
     try:
-        response = requests.post(url, headers=headers, json=payload)
+        response = http_client.post(url, headers=headers, json=payload)
         data = response.json()
         manufacturers = data.get("data", [])
 
@@ -2105,6 +2886,7 @@ def get_kcar_manufacturers():
         return []
 
 
+@catalog_cached("kcar_models")
 def get_kcar_models(maker_code):
     """Получение списка моделей для выбранной марки с KCar"""
     url = "https://api.kcar.com/bc/search/group/modelGrp"
@@ -2119,7 +2901,7 @@ def get_kcar_models(maker_code):
     }
 
     try:
-        response = requests.post(url, headers=headers, json=payload)
+        response = http_client.post(url, headers=headers, json=payload)
         data = response.json()
         models = data.get("data", [])
 
@@ -2150,7 +2932,7 @@ def get_kcar_generations(maker_code, model_code):
     }
 
     try:
-        response = requests.post(url, headers=headers, json=payload)
+        response = http_client.post(url, headers=headers, json=payload)
         data = response.json()
         generations = data.get("data", [])
 
@@ -2184,7 +2966,7 @@ def get_kcar_configurations(maker_code, model_group_code, model_code):
     }
 
     try:
-        response = requests.post(url, headers=headers, json=payload)
+        response = http_client.post(url, headers=headers, json=payload)
         data = response.json()
         configurations = data.get("data", [])
 
@@ -2207,10 +2989,11 @@ def get_kcar_configurations(maker_code, model_group_code, model_code):
 
 def handle_kcar_search(call):
     """Обработчик для поиска автомобилей на KCar"""
+    show_loading(call)
     # Получаем список производителей
     manufacturers = get_kcar_manufacturers()
     if not manufacturers:
-        bot.answer_callback_query(call.id, "Не удалось загрузить марки с KCar.")
+        restore_step(call, "Не удалось загрузить марки с KCar.")
         return
 
     # Создаем клавиатуру с марками
@@ -2222,12 +3005,11 @@ def handle_kcar_search(call):
         callback_data = f"kcar_brand_{maker_code}_{maker_name}"
         markup.add(types.InlineKeyboardButton(maker_name, callback_data=callback_data))
 
-    bot.send_message(
-        call.message.chat.id, "Выберите марку автомобиля:", reply_markup=markup
-    )
+    show_step(call, "Выберите марку автомобиля:", reply_markup=markup)
 
 
 @bot.callback_query_handler(func=lambda call: call.data.startswith("kcar_brand_"))
+@wizard_step("kcar_brand")
 def handle_kcar_brand_selection(call):
     """Обработчик выбора марки автомобиля на KCar"""
     # Парсим данные из callback_data
@@ -2244,10 +3026,11 @@ def handle_kcar_brand_selection(call):
     user_search_data[user_id]["kcar_maker_name"] = maker_name
 
     # Получаем список моделей для выбранной марки
+    show_loading(call)
     models = get_kcar_models(maker_code)
     if not models:
-        bot.send_message(
-            call.message.chat.id,
+        restore_step(
+            call,
             f"Не удалось загрузить модели для {maker_name} или для этой марки нет доступных моделей.",
         )
         return
@@ -2260,14 +3043,15 @@ def handle_kcar_brand_selection(call):
         callback_data = f"kcar_model_{model_code}_{model_name}"
         markup.add(types.InlineKeyboardButton(model_name, callback_data=callback_data))
 
-    bot.send_message(
-        call.message.chat.id,
+    show_step(
+        call,
         f"Марка: {maker_name}\nВыберите модель:",
         reply_markup=markup,
     )
 
 
 @bot.callback_query_handler(func=lambda call: call.data.startswith("kcar_model_"))
+@wizard_step("kcar_model")
 def handle_kcar_model_selection(call):
     """Обработчик выбора модели автомобиля на KCar"""
     # Парсим данные из callback_data
@@ -2288,10 +3072,11 @@ def handle_kcar_model_selection(call):
     maker_code = user_search_data[user_id].get("kcar_maker_code", "")
 
     # Получаем список поколений для выбранной модели
+    show_loading(call)
     generations = get_kcar_generations(maker_code, model_code)
     if not generations:
-        bot.send_message(
-            call.message.chat.id,
+        restore_step(
+            call,
             f"Не удалось загрузить поколения для {model_name} или для этой модели нет доступных поколений.",
         )
         return
@@ -2311,14 +3096,15 @@ def handle_kcar_model_selection(call):
             types.InlineKeyboardButton(display_text, callback_data=callback_data)
         )
 
-    bot.send_message(
-        call.message.chat.id,
+    show_step(
+        call,
         f"Марка: {maker_name}\nМодель: {model_name}\nВыберите поколение:",
         reply_markup=markup,
     )
 
 
 @bot.callback_query_handler(func=lambda call: call.data.startswith("kcar_gen_"))
+@wizard_step("kcar_generation")
 def handle_kcar_generation_selection(call):
     """Обработчик выбора поколения автомобиля на KCar"""
     # Парсим данные из callback_data
@@ -2341,10 +3127,11 @@ def handle_kcar_generation_selection(call):
     model_code = user_search_data[user_id].get("kcar_model_code", "")
 
     # Получаем список конфигураций для выбранного поколения
+    show_loading(call)
     configurations = get_kcar_configurations(maker_code, model_code, gen_code)
     if not configurations:
-        bot.send_message(
-            call.message.chat.id,
+        restore_step(
+            call,
             f"Не удалось загрузить конфигурации для {gen_name} или для этого поколения нет доступных конфигураций.",
         )
         return
@@ -2364,8 +3151,8 @@ def handle_kcar_generation_selection(call):
             types.InlineKeyboardButton(display_text, callback_data=callback_data)
         )
 
-    bot.send_message(
-        call.message.chat.id,
+    show_step(
+        call,
         f"Марка: {maker_name}\nМодель: {model_name}\nПоколение: {gen_name}\nВыберите конфигурацию:",
         reply_markup=markup,
     )
@@ -2615,6 +3402,7 @@ def handle_kcar_mileage_to_selection(call):
 
 
 @bot.callback_query_handler(func=lambda call: call.data.startswith("kcar_color_"))
+@wizard_step("kcar_search")
 def handle_kcar_color_selection(call):
     """Обработчик выбора цвета для KCar"""
     # Парсим выбранный цвет
@@ -2663,8 +3451,8 @@ def handle_kcar_color_selection(call):
         parse_mode="HTML",
     )
 
-    # Ищем автомобили с помощью функции парсинга HTML
-    cars = search_kcar_cars_by_html(
+    # Ищем автомобили через JSON API (с запасным разбором HTML)
+    cars = search_kcar_cars(
         maker_code,
         model_code,
         gen_code,
@@ -2675,6 +3463,29 @@ def handle_kcar_color_selection(call):
         color=color_kr,  # Передаем корейское название цвета
     )
 
+    # Сохраняем запрос для отслеживания новых поступлений; уже найденные
+    # авто запоминаются при первой проверке и повторно не присылаются
+    add_subscription(
+        user_id,
+        call.message.chat.id,
+        {
+            "platform": "kcar",
+            "maker_code": maker_code,
+            "maker_name": maker_name,
+            "model_code": model_code,
+            "model_name": model_name,
+            "gen_code": gen_code,
+            "gen_name": gen_name,
+            "config_name": config_name,
+            "year_from": year_from,
+            "year_to": year_to,
+            "mileage_from": mileage_from,
+            "mileage_to": mileage_to,
+            "color": color_kr,
+        },
+        initial_results=0,
+    )
+
     if not cars:
         # Если автомобили не найдены
         bot.edit_message_text(
@@ -2694,60 +3505,16 @@ def handle_kcar_color_selection(call):
             parse_mode="HTML",
         )
 
-        # Отправляем информацию о каждом автомобиле
-        for car in cars:
-            car_message = (
-                f"🚗 <b>{car['title']}</b>\n\n"
-                f"💰 <b>Цена:</b> {car['price']}\n"
-                f"📅 <b>Год:</b> {car['year']}\n"
-                f"🛣 <b>Пробег:</b> {car['mileage']}\n"
-                f"⛽️ <b>Топливо:</b> {car['fuel_type']}\n"
-                f"📍 <b>Местоположение:</b> {car['location']}\n"
-            )
-
-            if car["description"]:
-                car_message += f"\n📝 <b>Описание:</b> {car['description']}\n"
-
-            if car["labels"]:
-                labels_text = ", ".join(car["labels"])
-                car_message += f"\n🏷 <b>Особенности:</b> {labels_text}\n"
-
-            # Добавляем ссылку на страницу автомобиля
-            car_message += f"\n🔎 <a href='{car['link']}'>Подробнее на сайте KCar</a>"
-
-            # Создаем клавиатуру с кнопкой для перехода к автомобилю
-            markup = types.InlineKeyboardMarkup()
-            markup.add(
-                types.InlineKeyboardButton("Открыть на сайте KCar", url=car["link"])
-            )
-
-            # Если есть изображение, отправляем фото с описанием
-            if car["img_url"]:
-                try:
-                    bot.send_photo(
-                        call.message.chat.id,
-                        car["img_url"],
-                        caption=car_message,
-                        reply_markup=markup,
-                        parse_mode="HTML",
-                    )
-                except Exception as e:
-                    print(f"Ошибка при отправке фото: {e}")
-                    # Если не удалось отправить фото, отправляем только текст
-                    bot.send_message(
-                        call.message.chat.id,
-                        car_message,
-                        reply_markup=markup,
-                        parse_mode="HTML",
-                    )
-            else:
-                # Если нет изображения, отправляем только текст
-                bot.send_message(
-                    call.message.chat.id,
-                    car_message,
-                    reply_markup=markup,
-                    parse_mode="HTML",
-                )
+        # Найденные авто отправляем альбомом со ссылками в подписях
+        # (через очередь: Telegram ограничивает ~1 сообщение в секунду на чат)
+        send_listing_batch(
+            call.message.chat.id,
+            [
+                (format_kcar_car(car), car["img_url"], kcar_digest_line(car))
+                for car in cars
+            ],
+            "🚗 Найденные автомобили KCar:\n\n",
+        )
 
     # Кнопки для дальнейших действий
     markup = types.InlineKeyboardMarkup(row_width=1)
@@ -2760,14 +3527,241 @@ def handle_kcar_color_selection(call):
         types.InlineKeyboardButton("🏠 Вернуться в главное меню", callback_data="start")
     )
 
-    bot.send_message(
+    send_queue.send_message(
         call.message.chat.id,
-        "Что вы хотите сделать дальше?",
+        "🔔 Запрос сохранён — мы сообщим о новых поступлениях.\n\nЧто вы хотите сделать дальше?",
         reply_markup=markup,
         parse_mode="HTML",
     )
 
 
+KCAR_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+
+def build_kcar_search_cond(
+    mnuftr_cd,
+    model_grp_cd,
+    model_cd,
+    year_from=None,
+    year_to=None,
+    mileage_from=None,
+    mileage_to=None,
+    color=None,
+):
+    """Условия поиска KCar (searchCond) по параметрам запроса"""
+    # Базовый поисковый запрос; выдача явно сортируется от новых к старым
+    # (как ModifiedDate у Encar и -orderDate у KbChaChaCha): мониторинг
+    # перестаёт листать на первом уже отправленном авто
+    search_cond = {
+        "wr_eq_mnuftr_cd": mnuftr_cd,
+        "wr_eq_model_grp_cd": model_grp_cd,
+        "wr_eq_model_cd": model_cd,
+        config.KCAR_ORDER_FIELD: config.KCAR_ORDER,
+    }
+
+    # Добавляем дополнительные параметры, если они указаны
+    if year_from and year_to:
+        search_cond["wr_bt_prdcn_year"] = f"{year_from},{year_to}"
+
+    if mileage_from is not None and mileage_to is not None:
+        search_cond["wr_bt_accent_km"] = f"{mileage_from},{mileage_to}"
+
+    # Добавляем параметр цвета, если выбран конкретный цвет (не "Любой")
+    if color and color != "Любой" and color in KCAR_COLOR_TRANSLATIONS:
+        search_cond["wr_eq_extl_color_nm"] = color
+
+    return search_cond
+
+
+def build_kcar_search_url(search_cond):
+    """URL страницы поиска KCar с условиями searchCond"""
+    # Преобразуем словарь в JSON строку и кодируем для URL
+    return f"https://www.kcar.com/bc/search?searchCond={urllib.parse.quote(json.dumps(search_cond))}"
+
+
+def kcar_search_cond_from_url(url):
+    """Условия поиска searchCond из URL страницы поиска KCar"""
+    query = urllib.parse.parse_qs(urllib.parse.urlsplit(url).query)
+    return json.loads(query["searchCond"][0])
+
+
+def kcar_api_payload(search_cond, page):
+    """Тело запроса к JSON-списку KCar: те же поля searchCond плюс страница"""
+    payload = {
+        "wr_eq_sell_dcd": "ALL",
+        "wr_in_multi_columns": "cntr_rgn_cd|cntr_cd",
+        "pageno": page,
+        "limit": config.KCAR_API_PAGE_SIZE,
+    }
+    payload.update(search_cond)
+    return payload
+
+
+def first_value(row, *keys, default=""):
+    """Первое непустое значение из нескольких возможных полей ответа"""
+    for key in keys:
+        value = row.get(key)
+        if value not in (None, ""):
+            return value
+    return default
+
+
+def format_kcar_number(value, unit):
+    try:
+        return f"{int(value):,}".replace(",", " ") + unit
+    except (TypeError, ValueError):
+        return str(value) if value else "Неизвестно"
+
+
+def parse_kcar_api_rows(data):
+    """
+    Преобразование ответа JSON-списка KCar в те же словари, что и parse_kcar_cars.
+    Бросает ValueError, если формат ответа не распознан (в том числе если
+    ни у одной строки нет ID автомобиля) — тогда используется разбор HTML.
+    """
+    body = data.get("data")
+    rows = body.get("rows") if isinstance(body, dict) else body
+    if not isinstance(rows, list):
+        raise ValueError("в ответе KCar нет списка автомобилей")
+
+    results = []
+    for row in rows:
+        car_id = first_value(row, "carCd", "car_cd")
+        if not car_id:
+            continue
+        link = f"https://www.kcar.com/bc/detail/carInfoDtl?i_sCarCd={car_id}"
+        title = first_value(row, "carWhlNm", "carNm") or " ".join(
+            str(part)
+            for part in (
+                row.get("mnuftrNm"),
+                row.get("modelNm"),
+                row.get("grdNm"),
+            )
+            if part
+        )
+        results.append(
+            {
+                "car_id": car_id,
+                "title": title or "Неизвестно",
+                "price": format_kcar_number(first_value(row, "prc", "carPrc"), "만원"),
+                "year": first_value(row, "prdcnYr", "mfgDt", default="Неизвестно"),
+                "mileage": format_kcar_number(first_value(row, "milg"), "km"),
+                "fuel_type": first_value(
+                    row, "fuelTypecdNm", "fuelNm", default="Неизвестно"
+                ),
+                "location": first_value(
+                    row, "cntrRgnNm", "cntrNm", default="Неизвестно"
+                ),
+                "description": first_value(row, "simcDesc"),
+                "link": link,
+                "img_url": first_value(row, "lsizeImgPath", "thumbImgPath"),
+                "labels": [],
+            }
+        )
+    if rows and not results:
+        raise ValueError("в строках ответа KCar нет ID автомобилей")
+    return results
+
+
+def search_kcar_cars_api(search_cond, limit=None):
+    """
+    Поиск автомобилей через JSON-список api.kcar.com с постраничной загрузкой.
+    Ошибки не перехватываются — вызывающий код переходит на разбор HTML.
+    """
+    results = []
+    for page in range(1, config.KCAR_API_MAX_PAGES + 1):
+        response = http_client.post(
+            config.KCAR_LIST_API_URL,
+            headers={**KCAR_HEADERS, "Content-Type": "application/json"},
+            json=kcar_api_payload(search_cond, page),
+        )
+        response.raise_for_status()
+        rows = parse_kcar_api_rows(response.json())
+        results.extend(rows)
+        if len(rows) < config.KCAR_API_PAGE_SIZE:
+            break
+        if limit is not None and len(results) >= limit:
+            break
+    return results[:limit] if limit is not None else results
+
+
+async def fetch_kcar_cars_api(search_cond, subscribers, key):
+    """
+    Асинхронный вариант search_kcar_cars_api для движка мониторинга:
+    страницы листаются до уже отправленного авто, не больше MONITOR_MAX_PAGES.
+    Если первая страница не изменилась с прошлой проверки (key — ключ
+    запроса), возвращается пустой список без разбора ответа.
+    """
+    results = []
+    for page in range(1, config.MONITOR_MAX_PAGES + 1):
+        response = await monitor_http.post(
+            config.KCAR_LIST_API_URL,
+            headers={**KCAR_HEADERS, "Content-Type": "application/json"},
+            json=kcar_api_payload(search_cond, page),
+        )
+        response.raise_for_status()
+        if page == 1 and page_unchanged(key, subscribers, response, KCAR_ID_PATTERN):
+            return []
+        rows = parse_kcar_api_rows(response.json())
+        results.extend(rows)
+        if len(rows) < config.KCAR_API_PAGE_SIZE or page_reaches_seen(
+            subscribers, rows, lambda car: car.get("car_id")
+        ):
+            break
+    return results
+
+
+async def fetch_kcar_cars_html(url):
+    """Загрузка и разбор HTML-страницы поиска KCar (запасной вариант)"""
+    response = await monitor_http.get(url, headers=KCAR_HEADERS)
+    if response.status_code != 200:
+        print(f"❌ KCar вернул статус {response.status_code}")
+        return None
+    # Разбор HTML выполняем вне цикла событий
+    return await asyncio.to_thread(parse_kcar_cars, response.text)
+
+
+def search_kcar_cars(
+    mnuftr_cd,
+    model_grp_cd,
+    model_cd,
+    year_from=None,
+    year_to=None,
+    mileage_from=None,
+    mileage_to=None,
+    color=None,
+    limit=5,
+):
+    """Поиск автомобилей на KCar: JSON API, при ошибке — разбор HTML страницы"""
+    search_cond = build_kcar_search_cond(
+        mnuftr_cd,
+        model_grp_cd,
+        model_cd,
+        year_from,
+        year_to,
+        mileage_from,
+        mileage_to,
+        color,
+    )
+    try:
+        return search_kcar_cars_api(search_cond, limit=limit)
+    except Exception as e:
+        print(f"⚠️ JSON API KCar недоступен, используем HTML: {e}")
+
+    return search_kcar_cars_by_html(
+        mnuftr_cd,
+        model_grp_cd,
+        model_cd,
+        year_from=year_from,
+        year_to=year_to,
+        mileage_from=mileage_from,
+        mileage_to=mileage_to,
+        color=color,
+    )
+
+
 def search_kcar_cars_by_html(
     mnuftr_cd,
     model_grp_cd,
@@ -2794,135 +3788,170 @@ def search_kcar_cars_by_html(
     Возвращает:
     list: Список автомобилей с информацией
     """
-    # Базовый поисковый запрос
-    base_search_cond = {
-        "wr_eq_mnuftr_cd": mnuftr_cd,
-        "wr_eq_model_grp_cd": model_grp_cd,
-        "wr_eq_model_cd": model_cd,
-    }
+    search_cond = build_kcar_search_cond(
+        mnuftr_cd,
+        model_grp_cd,
+        model_cd,
+        year_from,
+        year_to,
+        mileage_from,
+        mileage_to,
+        color,
+    )
+    url = build_kcar_search_url(search_cond)
 
-    # Добавляем дополнительные параметры, если они указаны
-    if year_from and year_to:
-        base_search_cond["wr_bt_prdcn_year"] = f"{year_from},{year_to}"
+    try:
+        print(f"DEBUG: Отправка запроса на URL: {url}")
+        response = http_client.get(url, headers=KCAR_HEADERS)
 
-    if mileage_from is not None and mileage_to is not None:
-        base_search_cond["wr_bt_accent_km"] = f"{mileage_from},{mileage_to}"
+        if response.status_code != 200:
+            print(f"Ошибка при получении страницы: {response.status_code}")
+            return []
 
-    # Добавляем параметр цвета, если выбран конкретный цвет (не "Любой")
-    if color and color != "Любой":
-        # Находим корейское название цвета среди ключей словаря
-        for kr_color, ru_color in KCAR_COLOR_TRANSLATIONS.items():
-            if kr_color == color:
-                # Здесь предполагается, что код цвета может потребоваться позже
-                # Сейчас используем просто корейское название
-                base_search_cond["wr_eq_extl_color_nm"] = kr_color
-                break
+        return parse_kcar_cars(response.text, limit=5)
+    except Exception as e:
+        print(f"Ошибка при поиске автомобилей на KCar через HTML: {e}")
+        return []
 
-    # Преобразуем словарь в JSON строку и кодируем для URL
-    search_cond = urllib.parse.quote(json.dumps(base_search_cond))
 
-    # Формируем URL для запроса
-    url = f"https://www.kcar.com/bc/search?searchCond={search_cond}"
+def kcar_query_key(req):
+    """Канонический ключ запроса KCar — URL страницы поиска"""
+    return build_kcar_search_url(
+        build_kcar_search_cond(
+            req["maker_code"],
+            req["model_code"],
+            req["gen_code"],
+            req["year_from"],
+            req["year_to"],
+            req["mileage_from"],
+            req["mileage_to"],
+            req["color"],
+        )
+    )
 
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    }
 
+def format_kcar_car(car, header=""):
+    """Текст карточки авто KCar"""
+    car_message = (
+        f"{header}"
+        f"🚗 <b>{car['title']}</b>\n\n"
+        f"💰 <b>Цена:</b> {car['price']}\n"
+        f"📅 <b>Год:</b> {car['year']}\n"
+        f"🛣 <b>Пробег:</b> {car['mileage']}\n"
+        f"⛽️ <b>Топливо:</b> {car['fuel_type']}\n"
+        f"📍 <b>Местоположение:</b> {car['location']}\n"
+    )
+
+    if car["description"]:
+        car_message += f"\n📝 <b>Описание:</b> {car['description']}\n"
+
+    if car["labels"]:
+        labels_text = ", ".join(car["labels"])
+        car_message += f"\n🏷 <b>Особенности:</b> {labels_text}\n"
+
+    # Добавляем ссылку на страницу автомобиля
+    car_message += f"\n🔎 <a href='{car['link']}'>Подробнее на сайте KCar</a>"
+    return car_message
+
+
+def kcar_digest_line(car):
+    """Строка сводки об авто KCar"""
+    return digest_line(
+        car["title"],
+        f"{car['year']}, {car['mileage']}, {car['price']}",
+        car["link"],
+        "Подробнее на сайте KCar",
+    )
+
+
+async def fetch_kcar_listings(url, subscribers):
+    """Объявления KCar по запросу: JSON API, при его сбое — разбор HTML"""
     try:
-        print(f"DEBUG: Отправка запроса на URL: {url}")
-        response = requests.get(url, headers=headers)
+        return await fetch_kcar_cars_api(
+            kcar_search_cond_from_url(url), subscribers, url
+        )
+    except Exception as api_err:
+        # Отпечаток частично прочитанной выдачи API не запоминаем
+        pending_page_validators.pop(url, None)
+        print(f"⚠️ JSON API KCar недоступен, используем HTML: {api_err}")
+        return await fetch_kcar_cars_html(url)
 
-        if response.status_code != 200:
-            print(f"Ошибка при получении страницы: {response.status_code}")
-            return []
 
-        soup = BeautifulSoup(response.text, "html.parser")
+async def kcar_notifications(new_cars):
+    """Уведомления о новых авто KCar для deliver_listings"""
+    return [
+        (
+            car["car_id"],
+            recipients,
+            format_kcar_car(
+                car, header="✅ Новое поступление на KCar по вашему запросу!\n\n"
+            ),
+            car["img_url"],
+            kcar_digest_line(car),
+        )
+        for car, recipients in new_cars
+    ]
 
-        # Ищем блок с автомобилями
-        car_list_wrap = soup.select_one("div.carListWrap")
-        if not car_list_wrap:
-            print("Не найден блок с автомобилями (div.carListWrap)")
-            return []
 
-        # Извлекаем все блоки с автомобилями
-        car_list_boxes = car_list_wrap.select("div.carListBox")
-        if not car_list_boxes:
-            print("Не найдены блоки с автомобилями (div.carListBox)")
-            return []
+async def check_for_new_kcar_cars(url):
+    """Проверка запроса KCar; новые объявления определяются по ID из ссылки на карточку"""
+    return await run_check(
+        url,
+        fetch_kcar_listings,
+        lambda car: car.get("car_id"),
+        kcar_notifications,
+        "✅ Новые поступления на KCar по вашему запросу: {count}\n\n",
+        "KCar",
+    )
 
-        results = []
-        for box in car_list_boxes[:5]:  # Ограничиваем до 5 результатов
-            try:
-                # Извлекаем данные об автомобиле
-                detail_info = box.select_one("div.detailInfo")
-                if not detail_info:
-                    continue
 
-                # Название автомобиля
-                car_name_elem = box.select_one("div.carName p.carTit a")
-                car_name = car_name_elem.text.strip() if car_name_elem else "Неизвестно"
-
-                # Получаем ссылку на автомобиль
-                car_link = car_name_elem.get("href", "") if car_name_elem else ""
-                if car_link:
-                    car_link = f"https://www.kcar.com{car_link}"
-
-                # Цена
-                car_exp_elem = box.select_one("div.carExpIn p.carExp")
-                car_price = car_exp_elem.text.strip() if car_exp_elem else "Неизвестно"
-
-                # Детали автомобиля (год, пробег, тип топлива)
-                car_details_elem = box.select_one("p.detailCarCon")
-                car_details = []
-                if car_details_elem:
-                    for span in car_details_elem.select("span"):
-                        car_details.append(span.text.strip())
-
-                year = car_details[0] if len(car_details) > 0 else "Неизвестно"
-                mileage = car_details[1] if len(car_details) > 1 else "Неизвестно"
-                fuel_type = car_details[2] if len(car_details) > 2 else "Неизвестно"
-                location = car_details[3] if len(car_details) > 3 else "Неизвестно"
-
-                # Изображение автомобиля
-                img_elem = box.select_one("div.carListImg a img")
-                img_url = img_elem.get("src", "") if img_elem else ""
-
-                # Краткое описание автомобиля
-                car_desc_elem = box.select_one("div.carSimcDesc")
-                car_desc = car_desc_elem.text.strip() if car_desc_elem else ""
-
-                # Получаем дополнительные метки (VIP, 360 и т.д.)
-                car_labels = []
-                free_delivery = box.select_one("span.stateDlvy")
-                if free_delivery:
-                    car_labels.append("Бесплатная доставка")
-
-                car_360 = box.select_one("span.car360Img")
-                if car_360:
-                    car_labels.append("360° обзор")
-
-                results.append(
-                    {
-                        "title": car_name,
-                        "price": car_price,
-                        "year": year,
-                        "mileage": mileage,
-                        "fuel_type": fuel_type,
-                        "location": location,
-                        "description": car_desc,
-                        "link": car_link,
-                        "img_url": img_url,
-                        "labels": car_labels,
-                    }
-                )
-            except Exception as e:
-                print(f"Ошибка при парсинге автомобиля: {e}")
-                continue
+def report_update_queue():
+    """Периодический вывод глубины очереди обработчиков, если она была непустой"""
+    pending, peak = update_pool.stats(reset_peak=True)
+    if peak:
+        print(f"📊 Очередь обработчиков: сейчас {pending}, максимум за период {peak}")
 
-        return results
-    except Exception as e:
-        print(f"Ошибка при поиске автомобилей на KCar через HTML: {e}")
-        return []
+
+def popular_makers(manufacturers, count_field, code_field):
+    """Коды марок с наибольшим числом объявлений (или первые по списку, если счётчика нет)"""
+    ranked = sorted(
+        manufacturers, key=lambda item: item.get(count_field) or 0, reverse=True
+    )
+    codes = [item.get(code_field) for item in ranked if item.get(code_field)]
+    return codes[: config.CATALOG_PREWARM_MAKERS]
+
+
+def prewarm_catalog():
+    """Прогрев снимка каталогов: марки всех площадок и модели популярных марок"""
+    started = time.time()
+    steps = [
+        (
+            get_manufacturers,
+            get_models_by_brand,
+            "Count",
+            "DisplayValue",
+        ),
+        (
+            get_kbchachacha_manufacturers,
+            get_kbchachacha_models,
+            "count",
+            "makerCode",
+        ),
+        (
+            get_kcar_manufacturers,
+            get_kcar_models,
+            "count",
+            "mnuftrCd",
+        ),
+    ]
+    for get_makers, get_models, count_field, code_field in steps:
+        try:
+            manufacturers = get_makers.refresh()
+            for maker_code in popular_makers(manufacturers, count_field, code_field):
+                get_models.refresh(maker_code)
+        except Exception as e:
+            print(f"⚠️ Ошибка прогрева каталога ({get_makers.__name__}): {e}")
+    print(f"🔥 Снимок каталогов обновлён за {time.time() - started:.1f} с")
 
 
 # Запуск бота
@@ -2934,9 +3963,55 @@ if __name__ == "__main__":
         f"🚀 [82 Auto Bot] Запуск бота — {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
     )
     print("📦 Загрузка сохранённых запросов пользователей...")
-    load_requests()
+    subscription_store.load()
     print("✅ Запросы успешно загружены.")
-    print("🤖 Бот запущен и ожидает команды...")
-    print("=" * 50)
+    seen_store.load()
+    nav_cache.load()
+    catalog_snapshot.load()
+    resumed = resume_monitoring()
+    monitor_scheduler.add_job(
+        "catalog_prewarm", prewarm_catalog, config.CATALOG_PREWARM_INTERVAL
+    )
+    monitor_scheduler.add_job(
+        "update_queue_stats", report_update_queue, config.BOT_QUEUE_REPORT_INTERVAL
+    )
+    monitor_scheduler.start()
+    send_queue.start()
+    update_pool.start()
+    print(f"🔁 Возобновлён мониторинг запросов: {resumed}")
     ACCESS = load_access()
-    bot.infinity_polling()
+
+    # Heroku перезапускает dyno сигналом SIGTERM: очередь отправки
+    # дорабатывает (остаток уходит в dead_letters.jsonl), а отложенные
+    # записи сбрасываются на диск до выхода (uvicorn ставит свой
+    # обработчик, но после его штатной остановки срабатывает atexit)
+    atexit.register(flush_all)
+    atexit.register(send_queue.drain, config.SEND_DRAIN_TIMEOUT)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    if config.WEBHOOK_URL:
+        # Режим вебхука: обновления приходят HTTP-запросами от Telegram
+        import uvicorn
+        from webhook import create_app
+
+        # Без секрета любой, кто узнал адрес, мог бы прислать поддельное
+        # обновление от имени администратора — генерируем его при запуске
+        webhook_secret = config.WEBHOOK_SECRET or secrets.token_urlsafe(32)
+        bot.remove_webhook()
+        bot.set_webhook(
+            url=config.WEBHOOK_URL.rstrip("/") + config.WEBHOOK_PATH,
+            secret_token=webhook_secret,
+        )
+        print(f"🌐 Бот запущен в режиме вебхука на порту {config.WEBHOOK_PORT}")
+        print("=" * 50)
+        uvicorn.run(
+            create_app(bot, webhook_secret, config.WEBHOOK_PATH),
+            host=config.WEBHOOK_HOST,
+            port=config.WEBHOOK_PORT,
+            log_level="warning",
+        )
+    else:
+        print("🤖 Бот запущен и ожидает команды...")
+        print("=" * 50)
+        bot.remove_webhook()
+        bot.infinity_polling()
@@ -0,0 +1,63 @@
+import threading
+
+# Верхние границы корзин гистограммы (в секундах)
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class LatencyHistogram:
+    """Потокобезопасная гистограмма длительности по именованным шагам"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._steps = {}  # шаг -> {"counts", "total", "max"}
+        self._lock = threading.Lock()
+
+    def observe(self, step, seconds):
+        with self._lock:
+            stats = self._steps.get(step)
+            if stats is None:
+                stats = {"counts": [0] * (len(self.buckets) + 1), "total": 0.0, "max": 0.0}
+                self._steps[step] = stats
+            index = next(
+                (i for i, bound in enumerate(self.buckets) if seconds <= bound),
+                len(self.buckets),
+            )
+            stats["counts"][index] += 1
+            stats["total"] += seconds
+            stats["max"] = max(stats["max"], seconds)
+
+    def quantile(self, step, q):
+        """Оценка квантиля по корзинам: верхняя граница корзины, где он лежит"""
+        with self._lock:
+            stats = self._steps.get(step)
+            if stats is None:
+                return None
+            counts = list(stats["counts"])
+            maximum = stats["max"]
+        target = q * sum(counts)
+        running = 0
+        for index, count in enumerate(counts):
+            running += count
+            if running >= target and count:
+                return min(self.buckets[index], maximum) if index < len(self.buckets) else maximum
+        return maximum
+
+    def summary(self):
+        """Сводка по шагам, от самого медленного в среднем: список словарей"""
+        with self._lock:
+            steps = {step: dict(stats, counts=list(stats["counts"])) for step, stats in self._steps.items()}
+        rows = []
+        for step, stats in steps.items():
+            count = sum(stats["counts"])
+            rows.append(
+                {
+                    "step": step,
+                    "count": count,
+                    "avg": stats["total"] / count,
+                    "max": stats["max"],
+                    "p50": self.quantile(step, 0.5),
+                    "p95": self.quantile(step, 0.95),
+                    "counts": stats["counts"],
+                }
+            )
+        return sorted(rows, key=lambda row: row["avg"], reverse=True)
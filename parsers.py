@@ -0,0 +1,196 @@
+import urllib.parse
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+# Используем lxml, если он установлен: он заметно быстрее встроенного парсера
+try:
+    import lxml  # noqa: F401
+
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+
+
+def has_class(name):
+    """
+    Условие для SoupStrainer: среди классов элемента есть name.
+    Строка class_=name в beautifulsoup4 4.13 не совпадает с элементом,
+    у которого несколько классов (div.list-in.type-wd-list), поэтому
+    список классов проверяем сами — значение может прийти как строкой
+    целиком, так и отдельными классами.
+    """
+
+    def match(value):
+        if not value:
+            return False
+        classes = value.split() if isinstance(value, str) else value
+        return name in classes
+
+    return match
+
+
+# Разбираем только контейнер со списком объявлений, а не всю страницу
+KBCHA_LIST_STRAINER = SoupStrainer("div", class_=has_class("type-wd-list"))
+KCAR_LIST_STRAINER = SoupStrainer("div", class_=has_class("carListWrap"))
+
+
+def make_soup(html, strainer=None, parser=None):
+    """BeautifulSoup по выбранному парсеру, при strainer — только нужная часть страницы"""
+    return BeautifulSoup(html, parser or HTML_PARSER, parse_only=strainer)
+
+
+def parse_kbchachacha_cars(html, limit=None, parser=None, strain=True):
+    """Разбор страницы списка KbChaChaCha в список авто (не больше limit)"""
+    soup = make_soup(html, KBCHA_LIST_STRAINER if strain else None, parser)
+
+    # Ищем блоки с автомобилями, останавливаясь на нужном количестве
+    car_areas = soup.select("div.list-in.type-wd-list div.area", limit=limit or 0)
+
+    results = []
+    for area in car_areas:
+        try:
+            # Извлекаем данные об автомобиле
+            car_seq = area.get("data-car-seq", "")
+            car_link = (
+                f"https://www.kbchachacha.com/public/car/detail.kbc?carSeq={car_seq}"
+            )
+
+            # Извлекаем название автомобиля
+            car_title = area.select_one("div.con div.item strong.tit")
+            title = car_title.text.strip() if car_title else "Неизвестно"
+
+            # Извлекаем данные о годе, пробеге и регионе
+            data_line = area.select_one("div.con div.item div.data-line")
+            details = (
+                [span.text.strip() for span in data_line.select("span")]
+                if data_line
+                else []
+            )
+            year = details[0] if len(details) > 0 else "Неизвестно"
+            mileage = details[1] if len(details) > 1 else "Неизвестно"
+            region = details[2] if len(details) > 2 else "Неизвестно"
+
+            # Извлекаем цену
+            price_elem = area.select_one(
+                "div.con div.item div.sort-wrap strong.pay span.price"
+            )
+            price = price_elem.text.strip() if price_elem else "Неизвестно"
+
+            # Получаем ссылку на изображение
+            img_elem = area.select_one("div.thumnail a.item span.item__img img")
+            img_url = img_elem.get("src", "") if img_elem else ""
+
+            results.append(
+                {
+                    "car_seq": car_seq,
+                    "title": title,
+                    "year": year,
+                    "mileage": mileage,
+                    "region": region,
+                    "price": price,
+                    "link": car_link,
+                    "img_url": img_url,
+                }
+            )
+        except Exception as e:
+            print(f"Ошибка при парсинге автомобиля: {e}")
+            continue
+
+    return results
+
+
+def kcar_car_id(link):
+    """ID авто KCar из ссылки на карточку (параметр i_sCarCd), иначе сама ссылка"""
+    query = urllib.parse.parse_qs(urllib.parse.urlsplit(link).query)
+    car_codes = query.get("i_sCarCd")
+    return car_codes[0] if car_codes else link
+
+
+def parse_kcar_cars(html, limit=None, parser=None, strain=True):
+    """Разбор страницы поиска KCar в список авто (не больше limit)"""
+    soup = make_soup(html, KCAR_LIST_STRAINER if strain else None, parser)
+
+    # Ищем блок с автомобилями
+    car_list_wrap = soup.select_one("div.carListWrap")
+    if not car_list_wrap:
+        print("Не найден блок с автомобилями (div.carListWrap)")
+        return []
+
+    # Извлекаем блоки с автомобилями, останавливаясь на нужном количестве
+    car_list_boxes = car_list_wrap.select("div.carListBox", limit=limit or 0)
+    if not car_list_boxes:
+        print("Не найдены блоки с автомобилями (div.carListBox)")
+        return []
+
+    results = []
+    for box in car_list_boxes:
+        try:
+            # Извлекаем данные об автомобиле
+            detail_info = box.select_one("div.detailInfo")
+            if not detail_info:
+                continue
+
+            # Название автомобиля
+            car_name_elem = box.select_one("div.carName p.carTit a")
+            car_name = car_name_elem.text.strip() if car_name_elem else "Неизвестно"
+
+            # Получаем ссылку на автомобиль
+            car_link = car_name_elem.get("href", "") if car_name_elem else ""
+            if car_link:
+                car_link = f"https://www.kcar.com{car_link}"
+
+            # Цена
+            car_exp_elem = box.select_one("div.carExpIn p.carExp")
+            car_price = car_exp_elem.text.strip() if car_exp_elem else "Неизвестно"
+
+            # Детали автомобиля (год, пробег, тип топлива)
+            car_details_elem = box.select_one("p.detailCarCon")
+            car_details = []
+            if car_details_elem:
+                for span in car_details_elem.select("span"):
+                    car_details.append(span.text.strip())
+
+            year = car_details[0] if len(car_details) > 0 else "Неизвестно"
+            mileage = car_details[1] if len(car_details) > 1 else "Неизвестно"
+            fuel_type = car_details[2] if len(car_details) > 2 else "Неизвестно"
+            location = car_details[3] if len(car_details) > 3 else "Неизвестно"
+
+            # Изображение автомобиля
+            img_elem = box.select_one("div.carListImg a img")
+            img_url = img_elem.get("src", "") if img_elem else ""
+
+            # Краткое описание автомобиля
+            car_desc_elem = box.select_one("div.carSimcDesc")
+            car_desc = car_desc_elem.text.strip() if car_desc_elem else ""
+
+            # Получаем дополнительные метки (VIP, 360 и т.д.)
+            car_labels = []
+            free_delivery = box.select_one("span.stateDlvy")
+            if free_delivery:
+                car_labels.append("Бесплатная доставка")
+
+            car_360 = box.select_one("span.car360Img")
+            if car_360:
+                car_labels.append("360° обзор")
+
+            results.append(
+                {
+                    "car_id": kcar_car_id(car_link) if car_link else "",
+                    "title": car_name,
+                    "price": car_price,
+                    "year": year,
+                    "mileage": mileage,
+                    "fuel_type": fuel_type,
+                    "location": location,
+                    "description": car_desc,
+                    "link": car_link,
+                    "img_url": img_url,
+                    "labels": car_labels,
+                }
+            )
+        except Exception as e:
+            print(f"Ошибка при парсинге автомобиля: {e}")
+            continue
+
+    return results
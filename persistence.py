@@ -0,0 +1,98 @@
+import json
+import os
+import tempfile
+import threading
+import weakref
+
+
+def atomic_write_json(path, data, **dump_kwargs):
+    """
+    Запись JSON через временный файл в той же папке с fsync и атомарным
+    переименованием: при сбое на диске остаётся либо старая, либо новая
+    версия файла, но не обрезанная.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(
+        prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory
+    )
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, **dump_kwargs)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    # Фиксируем само переименование (на Windows папку открыть нельзя)
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+# Все созданные писатели — для сброса на диск при завершении процесса
+_writers = weakref.WeakSet()
+
+
+def flush_all():
+    """Немедленная запись всех отложенных изменений (при остановке процесса)"""
+    for writer in list(_writers):
+        writer.flush()
+
+
+class DebouncedWriter:
+    """
+    Отложенное сохранение состояния в JSON-файл.
+
+    mark_dirty() только помечает состояние изменённым; запись выполняется
+    не чаще одного раза за delay секунд, поэтому серия изменений подряд
+    стоит одной записи. Снимок состояния берётся функцией snapshot в
+    момент записи. Таймер не фоновый: при штатном завершении процесса
+    отложенная запись успевает выполниться.
+    """
+
+    def __init__(self, path, snapshot, delay=2.0, **dump_kwargs):
+        self.path = path
+        self.snapshot = snapshot
+        self.delay = delay
+        self.dump_kwargs = dump_kwargs
+        self._dirty = False
+        self._timer = None
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        _writers.add(self)
+
+    def mark_dirty(self):
+        with self._lock:
+            self._dirty = True
+            self._schedule()
+
+    def _schedule(self):
+        # Вызывается под self._lock
+        if self._timer is None:
+            self._timer = threading.Timer(self.delay, self.flush)
+            self._timer.start()
+
+    def flush(self):
+        """Немедленная запись накопленных изменений (если они есть)"""
+        with self._write_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                if not self._dirty:
+                    return
+                self._dirty = False
+            try:
+                atomic_write_json(self.path, self.snapshot(), **self.dump_kwargs)
+            except Exception as e:
+                # Повторяем запись по таймеру, не дожидаясь новых изменений
+                with self._lock:
+                    self._dirty = True
+                    self._schedule()
+                print(f"⚠️ Ошибка при сохранении {self.path}: {e}")
@@ -0,0 +1,258 @@
+import asyncio
+import heapq
+import inspect
+import itertools
+import threading
+import time
+
+
+class MonitorScheduler:
+    """
+    Общий планировщик мониторинга подписок на asyncio.
+
+    Хранит задачи в очереди с приоритетом по времени следующего запуска и
+    выполняет их в одном цикле событий в отдельном потоке. Корутины
+    выполняются прямо в цикле (не более max_workers одновременно), обычные
+    функции — в пуле потоков цикла, поэтому число потоков и одновременных
+    запросов к площадкам не растёт вместе с числом подписок.
+
+    Если функция задачи вернула число, оно становится новым интервалом
+    задачи (см. AdaptiveInterval).
+    """
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self._heap = []  # (время запуска, seq, job_id)
+        self._jobs = {}  # job_id -> описание задачи
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._wakeup = None
+        self._slots = None
+        self._running = False
+
+    def start(self):
+        """Запуск потока с циклом событий и диспетчера задач"""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+            self._loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            self._thread = threading.Thread(
+                target=self._run_loop, args=(ready,), name="monitor-loop", daemon=True
+            )
+            self._thread.start()
+        ready.wait()
+
+    def stop(self, wait=True):
+        """Остановка планировщика; задачи остаются зарегистрированными"""
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+        self._notify()
+        if wait:
+            self._thread.join()
+        self._thread = None
+
+    def run_coroutine(self, coro, timeout=None):
+        """Выполнение корутины в цикле планировщика из обычного потока"""
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        return future.result(timeout)
+
+    def add_job(self, job_id, func, interval, delay=0):
+        """Регистрация (или замена) задачи, первый запуск через delay секунд"""
+        with self._lock:
+            self._jobs[job_id] = {
+                "func": func,
+                "interval": interval,
+                "seq": None,
+                "running": False,
+                "pending": False,
+            }
+            self._push(job_id, time.monotonic() + delay)
+        self._notify()
+
+    def remove_job(self, job_id):
+        """Удаление задачи; уже запущенная проверка доработает до конца"""
+        with self._lock:
+            return self._jobs.pop(job_id, None) is not None
+
+    def reschedule(self, job_id, delay=None, interval=None):
+        """Перенос следующего запуска задачи и/или смена её интервала"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            if interval is not None:
+                job["interval"] = interval
+            if delay is None:
+                delay = job["interval"]
+            self._push(job_id, time.monotonic() + delay)
+        self._notify()
+        return True
+
+    def has_job(self, job_id):
+        with self._lock:
+            return job_id in self._jobs
+
+    def job_ids(self):
+        with self._lock:
+            return list(self._jobs)
+
+    def _push(self, job_id, due):
+        # Старые записи кучи становятся недействительными по несовпадению seq
+        seq = next(self._seq)
+        self._jobs[job_id]["seq"] = seq
+        heapq.heappush(self._heap, (due, seq, job_id))
+
+    def _notify(self):
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(self._wakeup.set)
+            except (AttributeError, RuntimeError):
+                pass
+
+    def _run_loop(self, ready):
+        asyncio.set_event_loop(self._loop)
+        self._wakeup = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.max_workers)
+        ready.set()
+        try:
+            self._loop.run_until_complete(self._dispatch())
+        finally:
+            self._loop.close()
+            self._loop = None
+
+    async def _dispatch(self):
+        tasks = set()
+        while self._running:
+            timeout = None
+            due_jobs = []
+            with self._lock:
+                now = time.monotonic()
+                while self._heap and self._heap[0][0] <= now:
+                    _, seq, job_id = heapq.heappop(self._heap)
+                    job = self._jobs.get(job_id)
+                    if job is None or job["seq"] != seq:
+                        continue
+                    if job["running"]:
+                        # Предыдущая проверка ещё идёт — запустим сразу после неё
+                        job["pending"] = True
+                        continue
+                    job["running"] = True
+                    due_jobs.append((job_id, job, seq))
+                if self._heap:
+                    timeout = self._heap[0][0] - now
+
+            for job_id, job, seq in due_jobs:
+                task = asyncio.ensure_future(self._run(job_id, job, seq))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, job_id, job, seq):
+        try:
+            async with self._slots:
+                if inspect.iscoroutinefunction(job["func"]):
+                    interval = await job["func"]()
+                else:
+                    interval = await asyncio.to_thread(job["func"])
+            if isinstance(interval, (int, float)) and interval > 0:
+                with self._lock:
+                    job["interval"] = interval
+        except Exception as e:
+            print(f"🔧 Ошибка в задаче мониторинга {job_id}: {e}")
+        finally:
+            with self._lock:
+                job["running"] = False
+                if self._jobs.get(job_id) is not job:
+                    return
+                if job["pending"]:
+                    job["pending"] = False
+                    self._push(job_id, time.monotonic())
+                elif job["seq"] == seq:
+                    # Если во время проверки был вызван reschedule, его время сохраняется
+                    self._push(job_id, time.monotonic() + job["interval"])
+            self._wakeup.set()
+
+
+class AdaptiveInterval:
+    """
+    Интервал опроса запроса по наблюдаемой частоте новых объявлений.
+
+    Частота поступлений сглаживается экспоненциально (EWMA), а интервал
+    подбирается так, чтобы за одну проверку в среднем находилось
+    target_per_poll новых объявлений, в пределах [min_interval, max_interval].
+    Оценка стартует с частоты, соответствующей base_interval, а за одну
+    проверку интервал растёт не больше чем в max_growth раз, поэтому без
+    новых объявлений он увеличивается постепенно.
+    """
+
+    def __init__(
+        self,
+        base_interval,
+        min_interval,
+        max_interval,
+        target_per_poll=1.0,
+        alpha=0.3,
+        max_growth=1.5,
+    ):
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_per_poll = target_per_poll
+        self.alpha = alpha
+        self.max_growth = max_growth
+        # key -> (время прошлой проверки, объявлений в секунду, текущий интервал)
+        self._state = {}
+        self._lock = threading.Lock()
+
+    def observe(self, key, new_count):
+        """Учёт результата проверки; возвращает интервал до следующей"""
+        now = time.monotonic()
+        with self._lock:
+            state = self._state.get(key)
+            if state is None:
+                # Первая проверка лишь запоминает выдачу: исходная оценка
+                # частоты соответствует базовому интервалу
+                self._state[key] = (
+                    now,
+                    self.target_per_poll / self.base_interval,
+                    self.base_interval,
+                )
+                return self.base_interval
+            last_at, rate, interval = state
+            elapsed = max(now - last_at, 1.0)
+            rate = self.alpha * (new_count / elapsed) + (1 - self.alpha) * rate
+            interval = min(self._interval(rate), interval * self.max_growth)
+            interval = max(self.min_interval, interval)
+            self._state[key] = (now, rate, interval)
+        return interval
+
+    def interval(self, key):
+        """Текущий интервал запроса (базовый, пока проверок не было)"""
+        with self._lock:
+            state = self._state.get(key)
+        return self.base_interval if state is None else state[2]
+
+    def forget(self, key):
+        with self._lock:
+            self._state.pop(key, None)
+
+    def _interval(self, rate):
+        if rate <= 0:
+            return self.max_interval
+        interval = self.target_per_poll / rate
+        return min(self.max_interval, max(self.min_interval, interval))
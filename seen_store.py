@@ -0,0 +1,177 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def encode_listing_id(listing_id):
+    """Числовые ID (Encar Id, KbChaChaCha carSeq) храним как INTEGER, остальные — как текст"""
+    listing_id = str(listing_id).strip()
+    return int(listing_id) if listing_id.isdigit() else listing_id
+
+
+class SeenStore:
+    """
+    Индекс уже отправленных объявлений в разрезе подписок.
+
+    Хранится в SQLite (таблица без rowid, числовые ID — компактными
+    INTEGER), в память подписка подгружается лениво при первом обращении,
+    после чего проверка выполняется по множеству за O(1). Записи старше
+    горизонта и сверх лимита на подписку регулярно удаляются; срок хранения
+    объявлений, которые всё ещё встречаются в выдаче, продлевается (touch).
+    """
+
+    def __init__(
+        self,
+        path,
+        max_per_scope=1000,
+        ttl=30 * 24 * 3600,
+        prune_interval=3600,
+        touch_interval=24 * 3600,
+    ):
+        self.path = path
+        self.max_per_scope = max_per_scope
+        self.ttl = ttl
+        self.prune_interval = prune_interval
+        self.touch_interval = touch_interval
+        self._conn = None
+        self._cache = {}  # scope -> set(listing_id)
+        self._touched = {}  # scope -> время последнего продления
+        self._lock = threading.Lock()
+        self._last_prune = 0
+
+    def load(self):
+        """Открытие базы; содержимое подписок читается лениво"""
+        with self._lock:
+            if self._conn is not None:
+                return
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS seen ("
+                "scope TEXT NOT NULL, listing_id NOT NULL, seen_at INTEGER NOT NULL, "
+                "PRIMARY KEY (scope, listing_id)) WITHOUT ROWID"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS seen_seen_at ON seen (seen_at)"
+            )
+            self._conn.commit()
+        self._import_json(os.path.splitext(self.path)[0] + ".json")
+        self.save()
+
+    def save(self):
+        """Фиксация накопленных изменений и периодическая очистка старых записей"""
+        with self._lock:
+            if self._conn is None:
+                return
+            now = time.time()
+            if now - self._last_prune >= self.prune_interval:
+                self._prune(now)
+                self._last_prune = now
+            if self._conn.in_transaction:
+                self._conn.commit()
+
+    def is_seen(self, scope, listing_id):
+        with self._lock:
+            return encode_listing_id(listing_id) in self._scope(scope)
+
+    def has_history(self, scope):
+        """Есть ли у подписки хотя бы одно отправленное объявление"""
+        with self._lock:
+            return bool(self._scope(scope))
+
+    def mark_seen(self, scope, listing_id):
+        """Отметка объявления как отправленного в рамках подписки"""
+        listing_id = encode_listing_id(listing_id)
+        with self._lock:
+            entries = self._scope(scope)
+            if listing_id in entries:
+                return
+            entries.add(listing_id)
+            self._conn.execute(
+                "INSERT OR IGNORE INTO seen (scope, listing_id, seen_at) VALUES (?, ?, ?)",
+                (scope, listing_id, int(time.time())),
+            )
+            # Небольшой запас, чтобы не обрезать подписку на каждой вставке
+            if len(entries) > self.max_per_scope * 1.1:
+                self._trim(scope)
+
+    def touch(self, scope, listing_ids):
+        """
+        Продление срока хранения объявлений, которые снова встретились в
+        выдаче: иначе машина, продающаяся дольше ttl, после очистки пришла
+        бы повторно. Обновляется не чаще раза в touch_interval на подписку.
+        """
+        with self._lock:
+            now = time.time()
+            if now - self._touched.get(scope, 0) < self.touch_interval:
+                return
+            self._touched[scope] = now
+            self._conn.executemany(
+                "UPDATE seen SET seen_at = ? WHERE scope = ? AND listing_id = ?",
+                [
+                    (int(now), scope, encode_listing_id(listing_id))
+                    for listing_id in listing_ids
+                ],
+            )
+
+    def drop_scope(self, scope):
+        """Удаление истории подписки (например, после удаления запроса)"""
+        with self._lock:
+            self._cache.pop(scope, None)
+            self._touched.pop(scope, None)
+            if self._conn is None:
+                return
+            self._conn.execute("DELETE FROM seen WHERE scope = ?", (scope,))
+            self._conn.commit()
+
+    def _scope(self, scope):
+        entries = self._cache.get(scope)
+        if entries is None:
+            rows = self._conn.execute(
+                "SELECT listing_id FROM seen WHERE scope = ?", (scope,)
+            )
+            entries = {row[0] for row in rows}
+            self._cache[scope] = entries
+        return entries
+
+    def _trim(self, scope):
+        self._conn.execute(
+            "DELETE FROM seen WHERE scope = ? AND listing_id NOT IN ("
+            "SELECT listing_id FROM seen WHERE scope = ? ORDER BY seen_at DESC, listing_id DESC LIMIT ?)",
+            (scope, scope, self.max_per_scope),
+        )
+        self._cache.pop(scope, None)
+
+    def _prune(self, now):
+        deleted = self._conn.execute(
+            "DELETE FROM seen WHERE seen_at < ?", (int(now - self.ttl),)
+        ).rowcount
+        if deleted:
+            # Кэш подписок перечитается из базы при следующем обращении
+            self._cache.clear()
+            print(f"🧹 Удалено устаревших записей из индекса объявлений: {deleted}")
+
+    def _import_json(self, json_path):
+        # Однократный перенос истории из прежнего формата seen.json
+        if not os.path.exists(json_path):
+            return
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO seen (scope, listing_id, seen_at) VALUES (?, ?, ?)",
+                    [
+                        (scope, encode_listing_id(listing_id), int(ts))
+                        for scope, entries in raw.items()
+                        for listing_id, ts in entries.items()
+                    ],
+                )
+                self._conn.commit()
+                self._cache.clear()
+            os.remove(json_path)
+            print(f"📥 История объявлений перенесена из {json_path}")
+        except Exception as e:
+            print(f"⚠️ Не удалось перенести {json_path}: {e}")
@@ -0,0 +1,273 @@
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+
+from telebot.apihelper import ApiTelegramException
+
+
+class TokenBucket:
+    """Ведро токенов: rate токенов в секунду, не больше capacity про запас"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def ready_in(self, now):
+        """Через сколько секунд появится токен (0 — уже есть)"""
+        self._refill(now)
+        if self._tokens >= 1:
+            return 0
+        return (1 - self._tokens) / self.rate
+
+    def consume(self, now, amount=1):
+        # Дорогие сообщения (альбомы) могут увести ведро в минус —
+        # следующие сообщения подождут, пока оно восполнится
+        self._refill(now)
+        self._tokens -= amount
+
+
+class SendQueue:
+    """
+    Очередь исходящих сообщений Telegram.
+
+    Сообщения отправляются несколькими потоками с ограничением скорости
+    по двум ведрам токенов: общему на бота (~30 сообщений в секунду) и
+    отдельному на каждый чат (~1 в секунду). Сообщения одного чата уходят
+    строго по порядку. На ответ 429 очередь приостанавливается на
+    retry_after, сетевые ошибки и 5xx повторяются с нарастающей паузой,
+    а сообщения, которые так и не удалось отправить (или не успели уйти
+    до остановки, см. drain), дописываются в dead_letter_path (JSON Lines).
+    """
+
+    def __init__(
+        self,
+        bot,
+        global_rate=30,
+        chat_rate=1,
+        chat_burst=3,
+        workers=8,
+        max_attempts=5,
+        dead_letter_path=None,
+    ):
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.dead_letter_path = dead_letter_path
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats = OrderedDict()  # chat_id -> deque сообщений
+        self._chat_buckets = {}
+        self._blocked_until = {}  # chat_id -> время, до которого чат на паузе
+        self._global_blocked_until = 0
+        self._busy = set()  # чаты, сообщение которых отправляется сейчас
+        self._cond = threading.Condition()
+        self._threads = []
+        self._dead_letter_lock = threading.Lock()
+
+    def start(self):
+        with self._cond:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(
+                    target=self._worker, name=f"send-queue-{index}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def send_message(self, chat_id, text, **kwargs):
+        """Постановка текстового сообщения в очередь"""
+        self._put(chat_id, {"method": "send_message", "text": text, "kwargs": kwargs})
+
+    def send_photo(self, chat_id, photo, caption=None, **kwargs):
+        """
+        Постановка фото в очередь. Если Telegram не примет фото (битая
+        ссылка и т.п.), вместо него отправляется подпись текстом.
+        """
+        self._put(
+            chat_id,
+            {"method": "send_photo", "photo": photo, "text": caption, "kwargs": kwargs},
+        )
+
+    def send_media_group(self, chat_id, media, **kwargs):
+        """
+        Постановка альбома (2–10 фото) в очередь. Telegram считает альбом
+        несколькими сообщениями, поэтому он расходует токен за каждое фото.
+        Если альбом не примут, вместо него отправляются подписи текстом.
+        """
+        self._put(
+            chat_id,
+            {
+                "method": "send_media_group",
+                "media": media,
+                "text": "\n\n".join(item.caption for item in media if item.caption),
+                "kwargs": kwargs,
+                "cost": len(media),
+            },
+        )
+
+    def pending(self):
+        """Число сообщений, ожидающих отправки"""
+        with self._cond:
+            return sum(len(messages) for messages in self._chats.values())
+
+    def drain(self, timeout):
+        """
+        Ожидание отправки очереди при остановке бота, не дольше timeout
+        секунд. Сообщения, которые не успели уйти, дописываются в
+        dead_letter_path; возвращает их число.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._threads and (self._busy or any(self._chats.values())):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            leftover = [
+                (chat_id, message)
+                for chat_id, messages in self._chats.items()
+                for message in messages
+            ]
+            self._chats.clear()
+        for chat_id, message in leftover:
+            self._dead_letter(chat_id, message, "не отправлено до остановки бота")
+        return len(leftover)
+
+    def _put(self, chat_id, message):
+        message["attempts"] = 0
+        with self._cond:
+            self._chats.setdefault(chat_id, deque()).append(message)
+            self._cond.notify()
+
+    def _next_chat(self, now):
+        # Первый по очереди свободный чат, которому разрешено отправлять;
+        # иначе — сколько ждать до ближайшего такого
+        wait = None
+        for chat_id, messages in self._chats.items():
+            if chat_id in self._busy or not messages:
+                continue
+            bucket = self._chat_buckets.get(chat_id)
+            if bucket is None:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst)
+                self._chat_buckets[chat_id] = bucket
+            ready_in = max(
+                self._blocked_until.get(chat_id, 0) - now,
+                self._global_blocked_until - now,
+                bucket.ready_in(now),
+                self._global.ready_in(now),
+            )
+            if ready_in <= 0:
+                cost = messages[0].get("cost", 1)
+                bucket.consume(now, cost)
+                self._global.consume(now, cost)
+                # Чат уходит в конец, чтобы чаты обслуживались по кругу
+                self._chats.move_to_end(chat_id)
+                return chat_id, None
+            wait = ready_in if wait is None else min(wait, ready_in)
+        return None, wait
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while True:
+                    chat_id, wait = self._next_chat(time.monotonic())
+                    if chat_id is not None:
+                        break
+                    self._cond.wait(wait)
+                message = self._chats[chat_id].popleft()
+                self._busy.add(chat_id)
+
+            retry_after = self._deliver(chat_id, message)
+
+            with self._cond:
+                self._busy.discard(chat_id)
+                if retry_after is not None:
+                    self._chats.setdefault(chat_id, deque()).appendleft(message)
+                    self._blocked_until[chat_id] = time.monotonic() + retry_after
+                elif not self._chats.get(chat_id):
+                    self._chats.pop(chat_id, None)
+                    self._blocked_until.pop(chat_id, None)
+                self._cond.notify_all()
+
+    def _deliver(self, chat_id, message):
+        """Отправка сообщения; число секунд до повтора или None"""
+        message["attempts"] += 1
+        try:
+            if message["method"] == "send_photo":
+                self.bot.send_photo(
+                    chat_id, message["photo"], caption=message["text"], **message["kwargs"]
+                )
+            elif message["method"] == "send_media_group":
+                self.bot.send_media_group(chat_id, message["media"], **message["kwargs"])
+            else:
+                self.bot.send_message(chat_id, message["text"], **message["kwargs"])
+            return None
+        except ApiTelegramException as e:
+            if e.error_code == 429:
+                retry_after = (e.result_json or {}).get("parameters", {}).get(
+                    "retry_after", 1
+                )
+                # Превышен общий лимит бота — притормаживаем все чаты
+                with self._cond:
+                    self._global_blocked_until = time.monotonic() + retry_after
+                print(f"⏳ Telegram просит подождать {retry_after} с")
+                if message["attempts"] < self.max_attempts * 2:
+                    return retry_after
+            elif e.error_code >= 500:
+                if message["attempts"] < self.max_attempts:
+                    return 2 ** message["attempts"]
+            elif message["method"] == "send_photo" and e.error_code == 400:
+                # Фото не принято — отправляем подпись обычным текстом
+                print(f"⚠️ Не удалось отправить фото {chat_id}: {e.description}")
+                message["method"] = "send_message"
+                message["attempts"] = 0
+                return 0
+            elif message["method"] == "send_media_group" and e.error_code == 400:
+                # Альбом не принят — отправляем подписи одним сообщением
+                print(f"⚠️ Не удалось отправить альбом {chat_id}: {e.description}")
+                message["method"] = "send_message"
+                message["kwargs"] = {
+                    "parse_mode": message["media"][0].parse_mode,
+                    "disable_web_page_preview": True,
+                }
+                message["attempts"] = 0
+                message["cost"] = 1
+                return 0
+            self._dead_letter(chat_id, message, e)
+        except Exception as e:
+            # Сетевые ошибки: повторяем с нарастающей паузой
+            if message["attempts"] < self.max_attempts:
+                return 2 ** message["attempts"]
+            self._dead_letter(chat_id, message, e)
+        return None
+
+    def _dead_letter(self, chat_id, message, error):
+        print(f"⚠️ Не удалось отправить сообщение {chat_id}: {error}")
+        if not self.dead_letter_path:
+            return
+        record = {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "chat_id": chat_id,
+            "method": message["method"],
+            "photo": message.get("photo"),
+            "text": message["text"],
+            "attempts": message["attempts"],
+            "error": str(error),
+        }
+        try:
+            with self._dead_letter_lock, open(
+                self.dead_letter_path, "a", encoding="utf-8"
+            ) as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except Exception as e:
+            print(f"⚠️ Ошибка записи в {self.dead_letter_path}: {e}")
@@ -0,0 +1,123 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+
+class SubscriptionStore:
+    """
+    Сохранённые запросы (подписки) пользователей.
+
+    Хранятся в SQLite в режиме WAL: одна строка на запрос с индексом по
+    пользователю, добавление и удаление — атомарные операции над одной
+    строкой, без перезаписи всего файла. Параметры запроса лежат в
+    колонке data в виде JSON, порядок запросов пользователя — порядок
+    их добавления.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Открытие базы и однократный перенос запросов из requests.json"""
+        with self._lock:
+            if self._conn is not None:
+                return
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS subscriptions ("
+                "id TEXT PRIMARY KEY, user_id INTEGER NOT NULL, "
+                "created_at INTEGER NOT NULL, data TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS subscriptions_user_id "
+                "ON subscriptions (user_id)"
+            )
+            self._conn.commit()
+        self._import_json(os.path.splitext(self.path)[0] + ".json")
+
+    def list(self, user_id):
+        """Запросы пользователя в порядке добавления"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM subscriptions WHERE user_id = ? ORDER BY rowid",
+                (int(user_id),),
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def all(self):
+        """Все запросы: список пар (user_id, запрос)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT user_id, data FROM subscriptions ORDER BY rowid"
+            ).fetchall()
+        return [(user_id, json.loads(data)) for user_id, data in rows]
+
+    def add(self, user_id, req):
+        """Сохранение запроса; идентификатор назначается, если его нет"""
+        if not req.get("id"):
+            req["id"] = uuid.uuid4().hex[:12]
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO subscriptions (id, user_id, created_at, data) "
+                "VALUES (?, ?, ?, ?)",
+                (req["id"], int(user_id), int(time.time()), json.dumps(req, ensure_ascii=False)),
+            )
+        return req
+
+    def remove(self, request_id):
+        """Удаление запроса; True, если он существовал"""
+        with self._lock, self._conn:
+            return (
+                self._conn.execute(
+                    "DELETE FROM subscriptions WHERE id = ?", (request_id,)
+                ).rowcount
+                > 0
+            )
+
+    def remove_user(self, user_id):
+        """Удаление всех запросов пользователя; возвращает удалённые запросы"""
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT data FROM subscriptions WHERE user_id = ? ORDER BY rowid",
+                (int(user_id),),
+            ).fetchall()
+            self._conn.execute(
+                "DELETE FROM subscriptions WHERE user_id = ?", (int(user_id),)
+            )
+        return [json.loads(row[0]) for row in rows]
+
+    def _import_json(self, json_path):
+        # Однократный перенос запросов из прежнего формата requests.json
+        if not os.path.exists(json_path):
+            return
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                content = f.read().strip()
+            raw = json.loads(content) if content else {}
+            rows = []
+            now = int(time.time())
+            for user_id, requests_list in raw.items():
+                for req in requests_list:
+                    # Старые записи сохранялись без идентификатора
+                    if not req.get("id"):
+                        req["id"] = uuid.uuid4().hex[:12]
+                    rows.append(
+                        (req["id"], int(user_id), now, json.dumps(req, ensure_ascii=False))
+                    )
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO subscriptions (id, user_id, created_at, data) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+            # Исходный файл оставляем как резервную копию
+            os.replace(json_path, json_path + ".imported")
+            print(f"📥 Запросы перенесены из {json_path}: {len(rows)}")
+        except Exception as e:
+            print(f"⚠️ Не удалось перенести {json_path}: {e}")
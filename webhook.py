@@ -0,0 +1,43 @@
+import hmac
+
+from fastapi import FastAPI, Request, Response
+from starlette.concurrency import run_in_threadpool
+from telebot import types
+
+
+def create_app(bot, secret_token, path="/telegram/webhook"):
+    """
+    FastAPI-приложение для приёма обновлений Telegram через вебхук.
+
+    Обновление проверяется по секретному заголовку (без него приложение
+    не создаётся), разбирается и
+    передаётся обработчикам telebot; сами обработчики выполняются в пуле
+    потоков бота, поэтому ответ Telegram отдаётся сразу (если очередь пула
+    переполнена — после освобождения места в ней).
+    """
+    if not secret_token:
+        raise ValueError("Для вебхука нужен секретный токен")
+
+    app = FastAPI(docs_url=None, redoc_url=None, openapi_url=None)
+
+    @app.post(path)
+    async def receive_update(request: Request):
+        if not hmac.compare_digest(
+            request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), secret_token
+        ):
+            return Response(status_code=403)
+
+        try:
+            update = types.Update.de_json(await request.json())
+        except Exception as e:
+            print(f"⚠️ Некорректное обновление от Telegram: {e}")
+            return Response(status_code=400)
+
+        await run_in_threadpool(bot.process_new_updates, [update])
+        return Response(status_code=200)
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    return app
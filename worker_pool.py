@@ -0,0 +1,115 @@
+import threading
+from collections import OrderedDict, deque
+
+import telebot
+
+
+class KeyedWorkerPool:
+    """
+    Ограниченный пул потоков с последовательной обработкой задач по ключу.
+
+    Задачи с одним ключом (например, нажатия одного пользователя)
+    выполняются строго по очереди, задачи с разными ключами — параллельно
+    в workers потоках. Если в очереди уже max_pending задач, submit ждёт
+    освобождения места, чтобы очередь не росла бесконечно.
+    """
+
+    def __init__(self, workers=8, max_pending=1000, name="worker"):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.name = name
+        self._tasks = {}  # ключ -> deque задач
+        self._ready = OrderedDict()  # ключи, задачи которых можно выполнять
+        self._busy = set()  # ключи, задача которых выполняется сейчас
+        self._pending = 0
+        self._max_seen = 0
+        self._cond = threading.Condition()
+        self._threads = []
+
+    def start(self):
+        with self._cond:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(
+                    target=self._worker, name=f"{self.name}-{index}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, key, func, *args):
+        """Постановка задачи в очередь ключа"""
+        with self._cond:
+            while self._pending >= self.max_pending:
+                self._cond.wait()
+            self._tasks.setdefault(key, deque()).append((func, args))
+            self._pending += 1
+            self._max_seen = max(self._max_seen, self._pending)
+            if key not in self._busy:
+                self._ready[key] = None
+            self._cond.notify_all()
+
+    def stats(self, reset_peak=False):
+        """Глубина очереди: (сейчас ожидает задач, максимум с прошлого сброса)"""
+        with self._cond:
+            result = (self._pending, self._max_seen)
+            if reset_peak:
+                self._max_seen = self._pending
+            return result
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._ready:
+                    self._cond.wait()
+                key, _ = self._ready.popitem(last=False)
+                func, args = self._tasks[key].popleft()
+                self._pending -= 1
+                self._busy.add(key)
+                self._cond.notify_all()
+
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"🔧 Ошибка в обработчике ({key}): {e}")
+
+            with self._cond:
+                self._busy.discard(key)
+                if self._tasks[key]:
+                    # Следующая задача ключа встаёт в конец очереди
+                    self._ready[key] = None
+                    self._cond.notify_all()
+                else:
+                    del self._tasks[key]
+
+
+def update_user_id(update):
+    """ID пользователя, от которого пришло обновление (или None)"""
+    for field in ("message", "edited_message", "callback_query", "inline_query"):
+        event = getattr(update, field, None)
+        if event is not None and getattr(event, "from_user", None) is not None:
+            return event.from_user.id
+    return None
+
+
+class PooledTeleBot(telebot.TeleBot):
+    """
+    TeleBot, обработчики которого выполняются в KeyedWorkerPool: обновления
+    одного пользователя обрабатываются по порядку, а медленная площадка
+    в обработчике одного пользователя не задерживает остальных.
+    """
+
+    def __init__(self, token, pool, **kwargs):
+        super().__init__(token, threaded=False, **kwargs)
+        self.pool = pool
+
+    def process_new_updates(self, updates):
+        for update in updates:
+            # telebot сдвигает last_update_id только в process_new_updates,
+            # а опрос запрашивает следующую порцию сразу после submit —
+            # без этого обновления, ждущие в пуле, пришли бы повторно
+            self.last_update_id = max(self.last_update_id, update.update_id)
+            key = update_user_id(update)
+            if key is None:
+                key = f"update-{update.update_id}"
+            self.pool.submit(key, super().process_new_updates, [update])